@@ -103,6 +103,10 @@ time_large = time.time() - start
 
 print(f"Nano model: {len(detections_nano)} detections in {time_nano:.2f}s")
 print(f"Large model: {len(detections_large)} detections in {time_large:.2f}s")
+
+# For accurate numbers (warm-up, percentiles, per-stage times) use:
+# สำหรับตัวเลขที่แม่นยำ (อุ่นเครื่อง เปอร์เซ็นไทล์ เวลาแต่ละขั้นตอน) ใช้:
+#   python src/car_detector.py benchmark --models yolov8n.pt yolov8l.pt
 """
     print(code)
 
@@ -186,6 +190,11 @@ print(f"Found {len(trucks)} trucks")
 # Filter by confidence / กรองด้วยความมั่นใจ
 high_conf = [d for d in detections if d['confidence'] > 0.8]
 print(f"Found {len(high_conf)} high-confidence detections")
+
+# Same filters without building dicts / กรองแบบเดียวกันโดยไม่ต้องสร้าง dict
+cars = detections.filter(classes=['car'])
+high_conf = detections.filter(min_confidence=0.8)
+print(detections.count_by_class())
 """
     print(code)
 
@@ -208,20 +217,16 @@ from pathlib import Path
 detector = CarDetector(model_name='yolov8n.pt')
 
 # Get all images in folder / รับรูปภาพทั้งหมดในโฟลเดอร์
-image_folder = Path('images')
-output_folder = Path('output')
-output_folder.mkdir(exist_ok=True)
+image_paths = [str(p) for p in Path('images').glob('*.jpg')]
 
-# Process each image / ประมวลผลแต่ละรูปภาพ
-for img_path in image_folder.glob('*.jpg'):
-    print(f"Processing {img_path.name}...")
-    
-    output_path = output_folder / f"detected_{img_path.name}"
-    detector.detect_cars_in_image(
-        str(img_path),
-        output_path=str(output_path),
-        show=False
-    )
+# Images are decoded in the background and sent to the model in batches
+# รูปภาพจะถูกอ่านล่วงหน้าและส่งเข้าโมเดลเป็นแบตช์
+for img_path, detections in detector.detect_cars_in_images(
+    image_paths,
+    batch_size=8,
+    output_dir='output'
+):
+    print(f"{img_path}: {len(detections)} vehicle(s)")
 
 print("Batch processing completed!")
 """
@@ -247,7 +252,7 @@ image, detections = detector.detect_cars_in_image('image.jpg', show=False)
 
 # Save detections to JSON / บันทึกการตรวจจับเป็น JSON
 with open('detections.json', 'w') as f:
-    json.dump(detections, f, indent=2)
+    json.dump(detections.to_dicts(), f, indent=2)
 
 # Load detections from JSON / โหลดการตรวจจับจาก JSON
 with open('detections.json', 'r') as f:
@@ -0,0 +1,230 @@
+"""
+Asyncio wrapper around CarDetector
+ตัวห่อ CarDetector สำหรับ asyncio
+
+CarDetector blocks while the model runs, which stalls an event loop when it
+is called from async code. AsyncCarDetector runs the model on one dedicated
+inference thread instead and lets coroutines await the result:
+  * await detect(image) queues one image; images awaited close together are
+    grouped into one model call (request coalescing), like the server's
+    MicroBatcher
+  * async for ... in detect_video(path) decodes frames on another thread and
+    yields the detections of each frame
+  * a cancelled detect() stays queued but is skipped when the next batch
+    is gathered; an image already inside a running batch is finished and
+    its result dropped
+  * close() fails every request that has not been answered yet
+
+Example:
+    async with AsyncCarDetector(CarDetector('yolov8n.pt')) as detector:
+        detections = await detector.detect('car.jpg')
+        results = await asyncio.gather(*(detector.detect(f) for f in frames))
+        async for frame_count, frame, detections in detector.detect_video('traffic.mp4'):
+            ...
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+class AsyncCarDetector:
+    """
+    Await detections from a CarDetector without blocking the event loop.
+    รอผลการตรวจจับจาก CarDetector โดยไม่บล็อก event loop
+
+    Only the inference thread touches the model, so the detector does not
+    need to be thread-safe. Create and use the wrapper inside one running
+    event loop.
+    """
+
+    def __init__(self, detector, max_batch=8, max_wait_ms=5.0, max_pending=None):
+        """
+        Args:
+            detector (CarDetector): Loaded detector
+            max_batch (int): Most images per model call
+            max_wait_ms (float): Longest time the first image of a batch
+                waits for more images
+            max_pending (int): Most images queued or running at once; more
+                detect() calls wait for a free place (optional)
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.images = 0
+        self.cancelled = 0
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_pending) if max_pending else None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self._io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='decode')
+        self._task = None
+        self._batch = []
+        self._closed = False
+
+    async def detect(self, image, roi=None):
+        """
+        Detect vehicles in one image.
+        ตรวจจับยานพาหนะในรูปภาพหนึ่งภาพ
+
+        Args:
+            image (np.ndarray or str): BGR image, or an image file path
+                (read on a background thread)
+            roi (RegionOfInterest): Only detect inside this region (optional)
+
+        Returns:
+            Detections: Vehicles found in the image
+        """
+        if self._closed:
+            raise RuntimeError("AsyncCarDetector is closed")
+        loop = asyncio.get_running_loop()
+        if isinstance(image, (str, Path)):
+            image = await loop.run_in_executor(self._io_executor, self.detector._read_image, image)
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+        if self._slots is not None:
+            await self._slots.acquire()
+        try:
+            future = loop.create_future()
+            await self._queue.put((image, roi, time.perf_counter(), future))
+            return await future
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    async def _next_batch(self):
+        """
+        Wait for the first request, then gather more until full or max_wait.
+        Requests are collected in self._batch, so close() can still reach
+        them if the task is cancelled halfway.
+        """
+        self._batch = batch = []
+        batch.append(await self._queue.get())
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            batch.append(item)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            # Skip requests cancelled while queued / ข้ามคำขอที่ถูกยกเลิกระหว่างรอคิว
+            live = [item for item in batch if not item[3].done()]
+            self.cancelled += len(batch) - len(live)
+            if not live:
+                continue
+            start = time.perf_counter()
+            images = [image for image, _, _, _ in live]
+            rois = [roi for _, roi, _, _ in live]
+            stages = [{'queue_wait': (start - queued) * 1000} for _, _, queued, _ in live]
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.detector.detect_frames, images, stages, rois
+                )
+            except Exception as e:
+                for _, _, _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(live)
+            if self.detector.metrics is not None:
+                self.detector.metrics.set_queue_depth('async_requests', self._queue.qsize())
+            for (_, _, _, future), detections, frame_stages in zip(live, results, stages):
+                try:
+                    self.detector._record_frame(frame_stages, detections, source='async')
+                except Exception as e:
+                    # A failing sink or metrics object fails this request only
+                    # ข้อผิดพลาดของ sink หรือ metrics มีผลเฉพาะคำขอนี้
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not future.done():
+                    future.set_result(detections)
+
+    async def detect_video(self, video_path, roi=None):
+        """
+        Detect vehicles in every frame of a video or camera.
+        ตรวจจับยานพาหนะในทุกเฟรมของวิดีโอหรือกล้อง
+
+        The next frame is decoded on a background thread while the current
+        one is being detected. Stop early with `break`; the video is
+        released when the iterator is closed.
+
+        Args:
+            video_path (str): Video file, stream URL or camera index
+            roi (RegionOfInterest): Only detect inside this region (optional)
+
+        Yields:
+            tuple: (frame_count, frame, detections), frame_count from 1
+        """
+        loop = asyncio.get_running_loop()
+        cap = await loop.run_in_executor(self._io_executor, self.detector._open_video, video_path)
+        frame_count = 0
+        reading = None
+        try:
+            reading = loop.run_in_executor(self._io_executor, cap.read)
+            while True:
+                ret, frame = await reading
+                if not ret:
+                    break
+                # Decode the next frame meanwhile / อ่านเฟรมถัดไประหว่างตรวจจับ
+                reading = loop.run_in_executor(self._io_executor, cap.read)
+                frame_count += 1
+                detections = await self.detect(frame, roi)
+                yield frame_count, frame, detections
+        finally:
+            # Let a pending read finish before releasing the capture
+            # รอให้การอ่านที่ค้างอยู่เสร็จก่อนปิดวิดีโอ
+            if reading is not None and not reading.done():
+                await asyncio.wait([reading])
+            await loop.run_in_executor(self._io_executor, cap.release)
+
+    async def close(self):
+        """Stop the batching task and the worker threads."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Fail requests of the interrupted batch and those still queued
+        # แจ้งคำขอในแบตช์ที่ถูกขัดจังหวะและคำขอที่ค้างในคิวว่าปิดแล้ว
+        unanswered = [item[3] for item in self._batch]
+        self._batch = []
+        while not self._queue.empty():
+            unanswered.append(self._queue.get_nowait()[3])
+        for future in unanswered:
+            if not future.done():
+                future.set_exception(RuntimeError("AsyncCarDetector is closed"))
+        # Wait for the worker threads without blocking the event loop
+        # รอเธรดทำงานให้จบโดยไม่บล็อก event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown, True)
+        await loop.run_in_executor(None, self._io_executor.shutdown, True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,409 @@
+"""
+Inference backends for CarDetector
+แบ็กเอนด์สำหรับการประมวลผลโมเดลของ CarDetector
+
+CarDetector talks to the model through a small backend interface so the
+same detection code can run on:
+  * 'torch'        - Ultralytics YOLO in PyTorch eager mode (default)
+  * 'onnx'         - ONNX Runtime with its own pre/post-processing and
+                     configurable thread counts (fastest on most CPUs)
+  * 'openvino'     - OpenVINO IR, run through Ultralytics
+  * 'torchscript'  - TorchScript, run through Ultralytics
+
+Exported models are written once to a cache folder (models/ by default)
+and reused on later runs. Loaded backends are kept in a process-wide
+registry (load_backend), so creating several detectors for the same model
+loads the weights only once, and warmup_backend() runs dummy frames so the
+first real frame does not pay for lazy initialization.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from box_ops import nms
+
+
+BACKENDS = ('auto', 'torch', 'onnx', 'openvino', 'torchscript')
+
+# Default folder for exported models / โฟลเดอร์เริ่มต้นสำหรับโมเดลที่ส่งออก
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / 'models'
+
+# Loaded backends shared by every detector in this process
+# แบ็กเอนด์ที่โหลดแล้ว ใช้ร่วมกันทุกตัวตรวจจับในโปรเซสนี้
+_loaded_backends = {}
+_loaded_lock = threading.Lock()
+
+
+class BackendResult:
+    """
+    Raw model output for one image, already on the host as NumPy arrays.
+    ผลลัพธ์ดิบของโมเดลสำหรับรูปภาพหนึ่งภาพในรูปแบบอาร์เรย์ NumPy
+
+    Attributes:
+        boxes (np.ndarray): float32 (N, 4) x1, y1, x2, y2 in image pixels
+        confidences (np.ndarray): float32 (N,)
+        class_ids (np.ndarray): int64 (N,)
+        speed (dict): preprocess/inference/postprocess milliseconds per image
+    """
+
+    __slots__ = ('boxes', 'confidences', 'class_ids', 'speed')
+
+    def __init__(self, boxes, confidences, class_ids, speed=None):
+        self.boxes = boxes
+        self.confidences = confidences
+        self.class_ids = class_ids
+        self.speed = speed or {}
+
+
+def letterbox(frames, size):
+    """
+    Resize and pad BGR frames into one (N, 3, S, S) float32 RGB batch.
+    ปรับขนาดและเติมขอบรูปภาพให้เป็นแบตช์ขนาด S x S
+
+    Returns:
+        tuple: (batch, transforms) where each transform is
+            (ratio, pad_x, pad_y, width, height) for mapping boxes back
+    """
+    batch = np.full((len(frames), size, size, 3), 114, dtype=np.uint8)
+    transforms = []
+    for i, frame in enumerate(frames):
+        height, width = frame.shape[:2]
+        ratio = min(size / height, size / width)
+        new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+        pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+        resized = frame if (new_w, new_h) == (width, height) else \
+            cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        batch[i, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+        transforms.append((ratio, pad_x, pad_y, width, height))
+    # BGR HWC uint8 -> RGB CHW float / แปลงเป็นรูปแบบที่โมเดลต้องการ
+    tensor = batch[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor), transforms
+
+
+def _exported_path(model_name, fmt, imgsz, cache_dir):
+    """Cache location of an exported model."""
+    stem = Path(model_name).stem
+    if fmt == 'onnx':
+        return Path(cache_dir) / f"{stem}_{imgsz}.onnx"
+    if fmt == 'torchscript':
+        return Path(cache_dir) / f"{stem}_{imgsz}.torchscript"
+    return Path(cache_dir) / f"{stem}_{imgsz}_{fmt}_model"
+
+
+def export_model(model_name, fmt, imgsz=640, cache_dir=None):
+    """
+    Export a YOLOv8 .pt model once and return the cached artifact path.
+    ส่งออกโมเดล YOLOv8 ครั้งเดียวและคืนค่าพาธของไฟล์ที่แคชไว้
+
+    Args:
+        model_name (str): YOLOv8 weights (e.g. yolov8n.pt)
+        fmt (str): 'onnx', 'openvino' or 'torchscript'
+        imgsz (int): Square input size baked into the export
+        cache_dir (str): Folder for exported models (default: models/)
+
+    Returns:
+        Path: The exported file (or folder, for OpenVINO)
+    """
+    cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+    target = _exported_path(model_name, fmt, imgsz, cache_dir)
+    if target.exists():
+        return target
+
+    from ultralytics import YOLO
+
+    print(f"Exporting {model_name} to {fmt} (one time) ...")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Dynamic batch lets the ONNX engine run real batches
+    # ใช้ขนาดแบตช์แบบไดนามิกเพื่อให้ประมวลผลหลายภาพพร้อมกันได้
+    exported = YOLO(model_name).export(
+        format=fmt, imgsz=imgsz, dynamic=(fmt == 'onnx'), verbose=False
+    )
+    shutil.move(str(exported), str(target))
+    print(f"Saved exported model to: {target}")
+    return target
+
+
+class UltralyticsBackend:
+    """
+    Run a model through Ultralytics YOLO (PyTorch or an exported format).
+    ประมวลผลโมเดลผ่าน Ultralytics YOLO
+    """
+
+    name = 'torch'
+
+    def __init__(self, model_path, imgsz=None, device=None, model=None):
+        """
+        Args:
+            model_path (str): Weights or exported model
+            imgsz (int): Input size passed to every prediction (optional)
+            device (str): Ultralytics device (optional)
+            model (YOLO): Already loaded model to share instead of loading
+                model_path again (optional)
+        """
+        if model is None:
+            from ultralytics import YOLO
+            model = YOLO(str(model_path), task='detect')
+        self.model = model
+        self.imgsz = imgsz
+        self.device = device
+        self.warmed_batch_sizes = set()
+
+    def predict(self, frames, conf, classes=None, max_det=300):
+        """
+        Run the model on a list of BGR images.
+
+        Args:
+            frames (list): BGR images
+            conf (float): Confidence threshold
+            classes (list): Only keep these class ids; others are dropped
+                before NMS (optional)
+            max_det (int): Maximum detections per image
+        """
+        kwargs = {'conf': conf, 'max_det': max_det, 'verbose': False}
+        if classes is not None:
+            kwargs['classes'] = list(classes)
+        if self.imgsz:
+            kwargs['imgsz'] = self.imgsz
+        if self.device is not None:
+            kwargs['device'] = self.device
+        results = self.model(frames, **kwargs)
+        return [
+            BackendResult(
+                r.boxes.xyxy.cpu().numpy(),
+                r.boxes.conf.cpu().numpy(),
+                r.boxes.cls.cpu().numpy().astype(np.int64),
+                r.speed
+            )
+            for r in results
+        ]
+
+
+class OnnxRuntimeBackend:
+    """
+    Run an exported YOLOv8 ONNX model directly with ONNX Runtime.
+    ประมวลผลโมเดล YOLOv8 ที่ส่งออกเป็น ONNX ด้วย ONNX Runtime โดยตรง
+
+    Pre-processing (letterbox, BGR->RGB, scaling) and post-processing
+    (confidence filter, class-aware NMS, rescaling) are done in NumPy, so
+    PyTorch is not needed at inference time.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path, imgsz=640, intra_op_threads=None,
+                 inter_op_threads=None, providers=None, iou_threshold=0.7,
+                 max_det=300):
+        """
+        Args:
+            model_path (str): Path to the .onnx file
+            imgsz (int): Square input size
+            intra_op_threads (int): Threads used inside one operator
+                (default: ONNX Runtime chooses)
+            inter_op_threads (int): Threads used across operators
+            providers (list): ONNX Runtime execution providers
+                (default: CPUExecutionProvider)
+            iou_threshold (float): NMS IoU threshold
+            max_det (int): Maximum detections per image
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "The 'onnx' backend needs ONNX Runtime: pip install onnxruntime"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options,
+            providers=providers or ['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = imgsz
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self.warmed_batch_sizes = set()
+
+    def _decode(self, output, conf, transform, classes=None, max_det=None):
+        """Turn one (4 + classes, anchors) output into image-space boxes."""
+        scores = output[4:]
+        best = scores.argmax(axis=0)
+        confidences = scores[best, np.arange(scores.shape[1])]
+        keep = confidences >= conf
+        if classes is not None:
+            # Drop other classes before NMS, matching Ultralytics' classes=
+            # ตัดคลาสอื่นออกก่อน NMS เหมือนกับ classes= ของ Ultralytics
+            keep &= np.isin(best, classes)
+        keep = np.flatnonzero(keep)
+        class_ids = best[keep]
+        confidences = confidences[keep]
+
+        cx, cy, w, h = output[0, keep], output[1, keep], output[2, keep], output[3, keep]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        index = nms(boxes, confidences, class_ids, self.iou_threshold, max_det or self.max_det)
+        boxes, confidences, class_ids = boxes[index], confidences[index], class_ids[index]
+
+        # Undo letterbox / แปลงพิกัดกลับเป็นของรูปภาพต้นฉบับ
+        ratio, pad_x, pad_y, width, height = transform
+        boxes -= np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)
+        boxes /= ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return boxes.astype(np.float32), confidences.astype(np.float32), class_ids.astype(np.int64)
+
+    def predict(self, frames, conf, classes=None, max_det=None):
+        """Run the model on a list of BGR images (see UltralyticsBackend.predict)."""
+        if classes is not None:
+            classes = np.asarray(classes, dtype=np.int64)
+        start = time.perf_counter()
+        tensor, transforms = letterbox(frames, self.imgsz)
+        preprocess = time.perf_counter()
+        output = self.session.run(None, {self.input_name: tensor})[0]
+        inference = time.perf_counter()
+        decoded = [self._decode(out, conf, t, classes, max_det) for out, t in zip(output, transforms)]
+        end = time.perf_counter()
+
+        n = len(frames)
+        speed = {
+            'preprocess': (preprocess - start) * 1000 / n,
+            'inference': (inference - preprocess) * 1000 / n,
+            'postprocess': (end - inference) * 1000 / n,
+        }
+        return [BackendResult(boxes, confs, ids, speed) for boxes, confs, ids in decoded]
+
+
+def _resolve_backend(path, backend):
+    """Validate a backend name and turn 'auto' into a concrete one."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if backend != 'auto':
+        return backend
+    if path.suffix == '.onnx':
+        return 'onnx'
+    if path.suffix == '.torchscript':
+        return 'torchscript'
+    if path.name.endswith('_openvino_model'):
+        return 'openvino'
+    return 'torch'
+
+
+def create_backend(model_name, backend='auto', imgsz=640, threads=None,
+                   cache_dir=None, device=None):
+    """
+    Build the backend for a model, exporting it first if needed.
+    สร้างแบ็กเอนด์สำหรับโมเดล และส่งออกโมเดลก่อนหากจำเป็น
+
+    Args:
+        model_name (str): YOLOv8 .pt weights, or an exported .onnx /
+            .torchscript file or *_openvino_model folder
+        backend (str): One of BACKENDS; 'auto' picks from the file type
+        imgsz (int): Model input size
+        threads (int): CPU threads for inference (optional)
+        cache_dir (str): Folder for exported models (default: models/)
+        device (str): Ultralytics device, e.g. 'cpu' or '0' (optional)
+
+    Returns:
+        UltralyticsBackend or OnnxRuntimeBackend
+    """
+    path = Path(model_name)
+    backend = _resolve_backend(path, backend)
+    if backend == 'torch':
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return UltralyticsBackend(model_name, imgsz=imgsz, device=device)
+
+    model_path = path if path.suffix == '.onnx' or path.suffix == '.torchscript' \
+        or path.name.endswith('_openvino_model') else export_model(model_name, backend, imgsz, cache_dir)
+
+    if backend == 'onnx':
+        return OnnxRuntimeBackend(model_path, imgsz=imgsz, intra_op_threads=threads)
+    ultralytics_backend = UltralyticsBackend(model_path, imgsz=imgsz, device=device)
+    ultralytics_backend.name = backend
+    return ultralytics_backend
+
+
+def load_backend(model_name, backend='auto', imgsz=640, threads=None,
+                 cache_dir=None, device=None):
+    """
+    Return a shared backend for a model, creating it on first use.
+    คืนค่าแบ็กเอนด์ที่ใช้ร่วมกัน โดยโหลดโมเดลเฉพาะครั้งแรก
+
+    Backends are keyed by model, backend, input size, thread count and
+    device; later calls with the same arguments reuse the loaded weights.
+    PyTorch weights accept any input size, so a torch backend with a new
+    size shares the weights already loaded for another size. Arguments are
+    the same as create_backend.
+
+    Returns:
+        tuple: (backend, reused) where reused is True when the model was
+            already loaded in this process
+    """
+    key = (
+        str(model_name), _resolve_backend(Path(model_name), backend),
+        imgsz, threads, None if cache_dir is None else str(cache_dir), device
+    )
+    with _loaded_lock:
+        loaded = _loaded_backends.get(key)
+        if loaded is not None:
+            return loaded, True
+        if key[1] == 'torch':
+            # Same weights at another input size / น้ำหนักเดิมแต่ขนาดอินพุตต่างกัน
+            for other_key, other in _loaded_backends.items():
+                if other_key[:2] == key[:2] and other_key[3:] == key[3:]:
+                    loaded = UltralyticsBackend(
+                        model_name, imgsz=imgsz, device=device, model=other.model
+                    )
+                    _loaded_backends[key] = loaded
+                    return loaded, True
+        loaded = create_backend(model_name, key[1], imgsz, threads, cache_dir, device)
+        _loaded_backends[key] = loaded
+        return loaded, False
+
+
+def clear_loaded_backends():
+    """Forget every shared backend so their memory can be freed."""
+    with _loaded_lock:
+        _loaded_backends.clear()
+
+
+def warmup_backend(backend, imgsz=640, batch_size=1, runs=2):
+    """
+    Run dummy frames through a backend to trigger lazy initialization.
+    ประมวลผลเฟรมจำลองเพื่อให้โมเดลเตรียมตัวก่อนใช้งานจริง
+
+    The first calls pay for graph optimization, memory allocation and
+    (for Ultralytics) predictor setup; after warming up, the first real
+    frame runs at steady-state speed. Each backend is warmed up once per
+    batch size.
+
+    Args:
+        backend: Backend from create_backend or load_backend
+        imgsz (int): Size of the square dummy frames
+        batch_size (int): Frames per dummy call (use the real batch size)
+        runs (int): Number of dummy calls
+
+    Returns:
+        float: Time spent in milliseconds (0 if already warmed up)
+    """
+    warmed = backend.warmed_batch_sizes
+    if batch_size in warmed:
+        return 0.0
+    frames = [np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)] * batch_size
+    start = time.perf_counter()
+    for _ in range(runs):
+        backend.predict(frames, conf=0.25)
+    warmed.add(batch_size)
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,326 @@
+"""
+Throughput and latency benchmark for CarDetector
+การวัดประสิทธิภาพความเร็วและความหน่วงของ CarDetector
+
+Runs the detector on synthetic or supplied inputs and reports latency
+percentiles, FPS, a per-stage time breakdown and peak memory for each
+model size. Results can be written as JSON for regression tracking.
+
+Usage:
+    python src/car_detector.py benchmark --models yolov8n.pt yolov8s.pt --json bench.json
+    python src/benchmark.py --input traffic.mp4 --iterations 300
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS
+
+try:
+    import resource
+except ImportError:
+    # Unix only; Windows runs report no peak memory / Windows ไม่มีโมดูลนี้
+    resource = None
+
+
+STAGES = ('decode', 'preprocess', 'inference', 'postprocess', 'draw', 'encode')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in megabytes, None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _synthetic_frames(width, height, count=8, seed=0):
+    """Encoded JPEG frames with random road-like content."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        image = np.full((height, width, 3), 90, dtype=np.uint8)
+        image += rng.integers(0, 40, size=image.shape, dtype=np.uint8)
+        for _ in range(10):
+            x, y = int(rng.integers(0, width - 80)), int(rng.integers(0, height - 50))
+            color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            cv2.rectangle(image, (x, y), (x + 80, y + 50), color, -1)
+        frames.append(cv2.imencode('.jpg', image)[1])
+    return frames
+
+
+class _StageTimer:
+    """Collect per-frame stage durations in milliseconds."""
+
+    def __init__(self):
+        self.frames = []
+        self._current = None
+        self._start = None
+
+    def start_frame(self):
+        self._current = dict.fromkeys(STAGES, 0.0)
+        self._start = time.perf_counter()
+
+    def add(self, stage, ms):
+        self._current[stage] += ms
+
+    def end_frame(self):
+        self._current['total'] = (time.perf_counter() - self._start) * 1000
+        self.frames.append(self._current)
+
+
+def _timed(timer, stage, fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    timer.add(stage, (time.perf_counter() - start) * 1000)
+    return value
+
+
+def _detect_timed(detector, image, timer):
+    """Run the model and split its time into preprocess/inference/postprocess."""
+    results = detector._predict([image])
+    # Backends report their own stage times in milliseconds
+    speed = results[0].speed
+    timer.add('preprocess', speed.get('preprocess') or 0.0)
+    timer.add('inference', speed.get('inference') or 0.0)
+    timer.add('postprocess', speed.get('postprocess') or 0.0)
+    return _timed(timer, 'postprocess', detector._vehicle_detections, results[0])
+
+
+def _run_images(detector, encoded_frames, iterations, warmup):
+    """Benchmark the image path: decode, detect, draw, JPEG encode."""
+    timer = _StageTimer()
+    for i in range(warmup + iterations):
+        encoded = encoded_frames[i % len(encoded_frames)]
+        timer.start_frame()
+        image = _timed(timer, 'decode', cv2.imdecode, encoded, cv2.IMREAD_COLOR)
+        detections = _detect_timed(detector, image, timer)
+        annotated = _timed(timer, 'draw', detector._draw_detections, image, detections)
+        _timed(timer, 'encode', cv2.imencode, '.jpg', annotated)
+        timer.end_frame()
+    return timer.frames[warmup:]
+
+
+def _run_video(detector, video_path, iterations, warmup):
+    """Benchmark the video path: cap.read, detect, draw, mp4v encode."""
+    timer = _StageTimer()
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video from {video_path}")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = cv2.VideoWriter(
+            str(Path(tmp) / 'bench.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), 25, (width, height)
+        )
+        try:
+            for i in range(warmup + iterations):
+                timer.start_frame()
+                ret, frame = _timed(timer, 'decode', cap.read)
+                if not ret:
+                    # Loop short clips / วนวิดีโอสั้นซ้ำ
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = _timed(timer, 'decode', cap.read)
+                    if not ret:
+                        break
+                detections = _detect_timed(detector, frame, timer)
+                _timed(timer, 'draw', detector._draw_video_detections,
+                       frame, detections, f"Vehicles: {len(detections)}")
+                _timed(timer, 'encode', writer.write, frame)
+                timer.end_frame()
+        finally:
+            writer.release()
+            cap.release()
+    return timer.frames[warmup:]
+
+
+def summarize(frames):
+    """
+    Turn per-frame timings into latency percentiles, FPS and stage means.
+    สรุปเวลาต่อเฟรมเป็นเปอร์เซ็นไทล์ความหน่วง FPS และเวลาเฉลี่ยแต่ละขั้นตอน
+    """
+    totals = np.array([f['total'] for f in frames], dtype=np.float64)
+    if not len(totals):
+        raise ValueError("No frames were benchmarked")
+    return {
+        'frames': len(totals),
+        'fps': float(1000.0 * len(totals) / totals.sum()),
+        'latency_ms': {
+            'mean': float(totals.mean()),
+            'p50': float(np.percentile(totals, 50)),
+            'p95': float(np.percentile(totals, 95)),
+            'p99': float(np.percentile(totals, 99)),
+        },
+        'stages_ms': {
+            stage: float(np.mean([f[stage] for f in frames])) for stage in STAGES
+        },
+    }
+
+
+def benchmark_model(model_name, input_path=None, width=1280, height=720,
+                    iterations=100, warmup=10, conf_threshold=0.5, backend='auto',
+                    threads=None):
+    """
+    Benchmark one model in the current process.
+    วัดประสิทธิภาพโมเดลหนึ่งตัวในโปรเซสปัจจุบัน
+
+    Args:
+        model_name (str): YOLOv8 model name
+        input_path (str): Image or video to use; synthetic frames when None
+        width (int): Synthetic frame width
+        height (int): Synthetic frame height
+        iterations (int): Frames measured
+        warmup (int): Frames run before measuring
+        conf_threshold (float): Confidence threshold
+        backend (str): Inference backend (see backends.py)
+        threads (int): CPU threads used for inference (optional)
+
+    Returns:
+        dict: Benchmark report for this model
+    """
+    from car_detector import CarDetector
+
+    load_start = time.perf_counter()
+    # Load a fresh copy so the reported load time is a real cold load
+    # โหลดโมเดลใหม่เพื่อให้เวลาโหลดที่รายงานเป็นเวลาจริง
+    detector = CarDetector(model_name=model_name, conf_threshold=conf_threshold,
+                           backend=backend, threads=threads, reuse_model=False)
+    load_ms = (time.perf_counter() - load_start) * 1000
+
+    if input_path and Path(input_path).suffix.lower() in VIDEO_EXTENSIONS:
+        mode, source = 'video', str(input_path)
+        frames = _run_video(detector, input_path, iterations, warmup)
+    else:
+        if input_path:
+            with open(input_path, 'rb') as f:
+                encoded = [np.frombuffer(f.read(), dtype=np.uint8)]
+            source = str(input_path)
+        else:
+            encoded = _synthetic_frames(width, height)
+            source = f"synthetic {width}x{height}"
+        mode = 'image'
+        frames = _run_images(detector, encoded, iterations, warmup)
+
+    report = {'model': model_name, 'backend': detector.backend.name, 'mode': mode,
+              'input': source, 'load_ms': load_ms}
+    report.update(summarize(frames))
+    report['peak_rss_mb'] = _peak_rss_mb()
+    return report
+
+
+def run_benchmarks(models, isolate=True, **kwargs):
+    """
+    Benchmark several models, each in a fresh process by default so that
+    peak memory is measured per model.
+    วัดประสิทธิภาพหลายโมเดล โดยค่าเริ่มต้นจะแยกโปรเซสต่อโมเดล
+
+    Returns:
+        dict: {'system': ..., 'results': [report, ...]}
+    """
+    results = []
+    for model_name in models:
+        if isolate:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(benchmark_model, model_name, **kwargs).result())
+        else:
+            results.append(benchmark_model(model_name, **kwargs))
+    return {
+        'system': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'opencv': cv2.__version__,
+        },
+        'results': results,
+    }
+
+
+def print_report(report):
+    """Print a benchmark report as a table."""
+    header = f"{'model':<14}{'backend':<12}{'mode':<7}{'FPS':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'RSS MB':>9}"
+    print(header)
+    print('-' * len(header))
+    for r in report['results']:
+        lat = r['latency_ms']
+        rss = '-' if r['peak_rss_mb'] is None else f"{r['peak_rss_mb']:.0f}"
+        print(f"{r['model']:<14}{r['backend']:<12}{r['mode']:<7}{r['fps']:>8.1f}{lat['p50']:>9.1f}"
+              f"{lat['p95']:>9.1f}{lat['p99']:>9.1f}{rss:>9}")
+    print()
+    print("Per-stage mean (ms) / เวลาเฉลี่ยต่อขั้นตอน (มิลลิวินาที):")
+    for r in report['results']:
+        stages = ', '.join(f"{k} {v:.1f}" for k, v in r['stages_ms'].items())
+        print(f"  {r['model']}: {stages}")
+
+
+def main(argv=None):
+    """Command line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog='car_detector.py benchmark',
+        description='Benchmark CarDetector throughput and latency / วัดประสิทธิภาพ CarDetector'
+    )
+    parser.add_argument(
+        '--models', nargs='+', default=['yolov8n.pt'],
+        help='Models to benchmark (e.g. yolov8n.pt yolov8s.pt)'
+    )
+    parser.add_argument(
+        '--input', '-i', type=str, default=None,
+        help='Image or video to benchmark on (default: synthetic frames)'
+    )
+    parser.add_argument('--width', type=int, default=1280, help='Synthetic frame width')
+    parser.add_argument('--height', type=int, default=720, help='Synthetic frame height')
+    parser.add_argument('--iterations', '-n', type=int, default=100, help='Frames to measure')
+    parser.add_argument('--warmup', type=int, default=10, help='Frames to run before measuring')
+    parser.add_argument('--conf', '-c', type=float, default=0.5, help='Confidence threshold')
+    parser.add_argument(
+        '--backend', type=str, default='auto',
+        choices=BACKENDS,
+        help='Inference backend to benchmark'
+    )
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for inference')
+    parser.add_argument('--json', type=str, default=None, help='Write the report to this JSON file')
+    parser.add_argument(
+        '--no-isolate', action='store_true',
+        help='Run all models in this process (peak RSS is then cumulative)'
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        args.models,
+        isolate=not args.no_isolate,
+        input_path=args.input,
+        width=args.width,
+        height=args.height,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        conf_threshold=args.conf,
+        backend=args.backend,
+        threads=args.threads
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to: {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
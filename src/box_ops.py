@@ -0,0 +1,73 @@
+"""
+Bounding box helpers shared by the tracker and backends
+ฟังก์ชันช่วยสำหรับกรอบสี่เหลี่ยมที่ใช้ร่วมกัน
+
+All boxes are x1, y1, x2, y2 in pixels.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Compute pairwise IoU between two sets of x1, y1, x2, y2 boxes.
+    คำนวณค่า IoU ระหว่างกรอบสองชุด
+
+    Returns:
+        np.ndarray: Array of shape (len(boxes_a), len(boxes_b))
+    """
+    a = np.asarray(boxes_a, dtype=np.float32)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32)[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def nms(boxes, scores, class_ids=None, iou_threshold=0.7, max_det=300):
+    """
+    Non-maximum suppression, class-aware when class_ids is given.
+    การกำจัดกรอบที่ซ้อนทับกัน (แยกตามคลาสเมื่อระบุ class_ids)
+
+    Args:
+        boxes (np.ndarray): (N, 4) boxes
+        scores (np.ndarray): (N,) confidences
+        class_ids (np.ndarray): (N,) class ids; boxes of different classes
+            never suppress each other (optional)
+        iou_threshold (float): Boxes overlapping a kept box more than this
+            are removed
+        max_det (int): Maximum number of boxes to keep
+
+    Returns:
+        np.ndarray: Indexes of the kept boxes, highest score first
+    """
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if not len(boxes):
+        return np.empty(0, dtype=np.int64)
+    if class_ids is not None:
+        # Shift each class to its own region so classes never overlap
+        # เลื่อนกรอบของแต่ละคลาสออกจากกันเพื่อไม่ให้ทับกัน
+        offset = float(boxes.max()) + 1
+        boxes = boxes + (np.asarray(class_ids, dtype=np.float32) * offset)[:, None]
+
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter = (
+            np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None) *
+            np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        )
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
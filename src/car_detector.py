@@ -8,12 +8,87 @@ Author: Object Detection Tutorial
 License: MIT
 """
 
-import cv2
-import argparse
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from ultralytics import YOLO
+
+# Make sibling modules importable however this file is loaded
+# ทำให้นำเข้าโมดูลในโฟลเดอร์เดียวกันได้ไม่ว่าจะโหลดไฟล์นี้ด้วยวิธีใด
+_SRC_DIR = str(Path(__file__).resolve().parent)
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+
+if __name__ == '__main__':
+    # Parse the command line before importing OpenCV, NumPy and the model
+    # code; cli.py imports this module again once a mode needs the detector
+    # แยกอาร์กิวเมนต์ก่อนนำเข้าโมดูลขนาดใหญ่ เพื่อให้ --help ทำงานได้ทันที
+    from cli import main
+    sys.exit(main())
+
+import cv2
 import numpy as np
 
+from backends import create_backend, load_backend, warmup_backend
+from detections import Detections
+from frame_gate import FrameGate
+from live import LatencyController, LatestFrameGrabber
+from shared_frames import SharedDecoders, SharedFrameRing, decode_images, decode_video
+from tracker import VehicleTracker
+from tiling import predict_tiled
+# Command-line entry point, still importable as car_detector.main
+from cli import main
+
+
+# File extensions picked up when a directory is given in batch mode
+# นามสกุลไฟล์ที่ใช้เมื่อระบุโฟลเดอร์ในโหมดแบตช์
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+# Marks the end of a frame queue in the video pipeline
+_END_OF_STREAM = object()
+
+
+def _elapsed_ms(start):
+    """Milliseconds since a time.perf_counter() timestamp."""
+    return (time.perf_counter() - start) * 1000
+
+
+@lru_cache(maxsize=1024)
+def _label_size(label, scale, thickness):
+    """
+    Rendered size of a label, cached because labels repeat every frame
+    (class name plus a two-decimal confidence).
+    """
+    return cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)[0]
+
+
+def collect_image_paths(source):
+    """
+    Expand a batch input into a list of image paths.
+    แปลงอินพุตแบบแบตช์เป็นรายการพาธของรูปภาพ
+    
+    Args:
+        source (str): A directory, a .txt file with one path per line,
+            or a single image path
+    
+    Returns:
+        list: Image paths as strings
+    """
+    source = Path(source)
+    if source.is_dir():
+        return sorted(
+            str(p) for p in source.iterdir()
+            if p.suffix.lower() in IMAGE_EXTENSIONS
+        )
+    if source.suffix.lower() == '.txt':
+        with open(source, 'r') as f:
+            return [line.strip() for line in f if line.strip()]
+    return [str(source)]
+
 
 class CarDetector:
     """
@@ -21,17 +96,60 @@ class CarDetector:
     คลาสสำหรับการตรวจจับรถยนต์ในรูปภาพและวิดีโอโดยใช้ YOLOv8
     """
     
-    def __init__(self, model_name='yolov8n.pt', conf_threshold=0.5):
+    def __init__(self, model_name='yolov8n.pt', conf_threshold=0.5, metrics=None,
+                 backend='auto', threads=None, imgsz=640, max_det=300,
+                 tile_size=None, tile_overlap=0.2, tile_batch=8, sink=None,
+                 reuse_model=True, warmup=False, cache=None):
         """
         Initialize the car detector.
         
         Args:
             model_name (str): YOLOv8 model name (yolov8n.pt, yolov8s.pt, etc.)
+                or an exported .onnx / .torchscript / *_openvino_model path
             conf_threshold (float): Confidence threshold for detections
+            metrics (Metrics): Receives per-frame stage timings, detection
+                counts and queue depths (optional)
+            backend (str): Inference engine: 'auto', 'torch', 'onnx',
+                'openvino' or 'torchscript' (see backends.py)
+            threads (int): CPU threads used for inference (optional)
+            imgsz (int): Model input size
+            max_det (int): Maximum vehicles kept per image
+            tile_size (int): Split large images into overlapping tiles of
+                this size and merge the results (optional, see tiling.py)
+            tile_overlap (float): Fraction of a tile shared with its neighbour
+            tile_batch (int): Tiles per model call
+            sink (DetectionSink): Receives the detections of every processed
+                image or frame (optional, see sinks.py)
+            reuse_model (bool): Share the loaded model with other detectors
+                in this process that use the same model, backend, imgsz
+                and threads instead of loading it again
+            warmup (bool): Run dummy frames now so the first real frame
+                is as fast as the rest (see warmup())
+            cache (ResultCache): Return stored detections for images seen
+                before instead of running the model (optional, see
+                result_cache.py)
         """
-        print(f"Loading model: {model_name}")
-        self.model = YOLO(model_name)
+        reused = False
+        if reuse_model:
+            self.backend, reused = load_backend(model_name, backend, imgsz=imgsz, threads=threads)
+        else:
+            self.backend = create_backend(model_name, backend, imgsz=imgsz, threads=threads)
+        print(f"{'Reusing loaded' if reused else 'Loading'} model: {model_name}")
+        if self.backend.name != 'torch':
+            print(f"Inference backend: {self.backend.name}")
+        # The Ultralytics YOLO object, or None for the ONNX Runtime engine
+        # ออบเจ็กต์ YOLO ของ Ultralytics หรือ None เมื่อใช้ ONNX Runtime
+        self.model = getattr(self.backend, 'model', None)
+        self.model_name = str(model_name)
         self.conf_threshold = conf_threshold
+        self.imgsz = imgsz
+        self.max_det = max_det
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_batch = tile_batch
+        self.metrics = metrics
+        self.sink = sink
+        self.cache = cache
         
         # COCO dataset class IDs for vehicles
         # รหัสคลาสสำหรับยานพาหนะใน COCO dataset
@@ -41,56 +159,75 @@ class CarDetector:
             5: 'bus',          # รถบัส
             7: 'truck'         # รถบรรทุก
         }
+        if warmup:
+            self.warmup()
     
-    def detect_cars_in_image(self, image_path, output_path=None, show=True):
+    def warmup(self, batch_size=1, runs=2):
         """
-        Detect cars in an image.
-        ตรวจจับรถยนต์ในรูปภาพ
+        Run dummy frames through the model to finish lazy initialization.
+        อุ่นเครื่องโมเดลด้วยเฟรมจำลองก่อนประมวลผลจริง
         
         Args:
-            image_path (str): Path to input image
-            output_path (str): Path to save output image (optional)
-            show (bool): Whether to display the result
+            batch_size (int): Frames per call; use the batch size of the
+                real workload
+            runs (int): Number of dummy calls
         
         Returns:
-            tuple: (annotated_image, detections)
+            float: Warm-up time in milliseconds (0 if already warmed up)
         """
-        # Read image / อ่านรูปภาพ
+        size = self.tile_size or self.imgsz
+        batch_size = self.tile_batch if self.tile_size else batch_size
+        warmup_ms = warmup_backend(self.backend, size, batch_size, runs)
+        if warmup_ms:
+            print(f"Warm-up: {warmup_ms:.0f} ms")
+        return warmup_ms
+    
+    def _read_image(self, image_path):
+        """Read an image from disk, raising ValueError if it cannot be decoded."""
         image = cv2.imread(str(image_path))
         if image is None:
             raise ValueError(f"Cannot read image from {image_path}")
+        return image
+    
+    def _vehicle_detections(self, result):
+        """
+        Extract vehicle detections from a single backend result.
+        ดึงการตรวจจับยานพาหนะจากผลลัพธ์ของโมเดลหนึ่งภาพ
+        
+        The model is already restricted to vehicle classes (see _predict);
+        the mask here only guards against a backend that ignores the
+        restriction.
         
-        # Run inference / ทำการตรวจจับ
-        results = self.model(image, conf=self.conf_threshold)
-        
-        # Filter only vehicle detections / กรองเฉพาะการตรวจจับยานพาหนะ
-        detections = []
-        for result in results:
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                if class_id in self.vehicle_classes:
-                    conf = float(box.conf[0])
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    detections.append({
-                        'class_id': class_id,
-                        'class_name': self.vehicle_classes[class_id],
-                        'confidence': conf,
-                        'bbox': [int(x1), int(y1), int(x2), int(y2)]
-                    })
-        
-        # Draw detections / วาดกรอบการตรวจจับ
-        annotated_image = image.copy()
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            label = f"{det['class_name']}: {det['confidence']:.2f}"
+        Returns:
+            Detections: The vehicle detections in the result
+        """
+        class_ids = result.class_ids
+        mask = np.isin(class_ids, np.fromiter(self.vehicle_classes, dtype=np.int64))
+        return Detections(
+            result.boxes[mask],
+            result.confidences[mask],
+            class_ids[mask],
+            self.vehicle_classes
+        )
+    
+    def _draw_detections(self, image, detections):
+        """
+        Draw detection boxes and labels onto the image in place and return it.
+        วาดกรอบและป้ายการตรวจจับลงบนรูปภาพโดยตรง (ไม่สร้างสำเนา)
+        """
+        annotated_image = image
+        for class_id, conf, (x1, y1, x2, y2) in zip(
+            detections.class_ids.tolist(),
+            detections.confidences.tolist(),
+            detections.boxes.tolist()
+        ):
+            label = f"{self.vehicle_classes[class_id]}: {conf:.2f}"
             
             # Draw rectangle / วาดกรอบสี่เหลี่ยม
             cv2.rectangle(annotated_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
             
             # Draw label / วาดป้ายข้อความ
-            (label_width, label_height), _ = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-            )
+            label_width, label_height = _label_size(label, 0.6, 2)
             cv2.rectangle(
                 annotated_image, 
                 (x1, y1 - label_height - 10), 
@@ -107,11 +244,187 @@ class CarDetector:
                 (0, 0, 0), 
                 2
             )
+        return annotated_image
+    
+    def _record_frame(self, stages, detections, frame=None, source=None, fps=None,
+                      timestamp=None):
+        """
+        Send one frame's stage timings to the metrics object and its
+        detections to the sink, if any. With the video's `fps`, sink rows
+        get the frame's position in the video; `timestamp` is the Unix time
+        the frame was captured (default: now).
+        """
+        if self.sink is not None:
+            video_time = (frame - 1) / fps if fps and frame else None
+            self.sink.write(detections, frame=frame, source=source,
+                            timestamp=timestamp, video_time=video_time)
+        if self.metrics is not None:
+            self.metrics.record_frame(stages, len(detections), frame=frame, source=source)
+    
+    def _postprocess(self, result, stages=None):
+        """
+        Filter one backend result, adding the model's own stage times to
+        `stages` (milliseconds per image) when a dict is given.
+        """
+        if stages is None:
+            return self._vehicle_detections(result)
+        for stage in ('preprocess', 'inference', 'postprocess'):
+            stages[stage] = stages.get(stage, 0.0) + (result.speed.get(stage) or 0.0)
+        start = time.perf_counter()
+        detections = self._vehicle_detections(result)
+        stages['postprocess'] += _elapsed_ms(start)
+        return detections
+    
+    def _cache_namespace(self, roi=None):
+        """Settings that change the detections, for result cache keys."""
+        namespace = (
+            f"{self.model_name}|{self.backend.name}|conf={self.conf_threshold}|"
+            f"imgsz={self.imgsz}|max_det={self.max_det}|"
+            f"tile={self.tile_size},{self.tile_overlap}"
+        )
+        if roi is not None:
+            namespace += f"|roi={roi.fingerprint}"
+        return namespace
+    
+    def _predict(self, frames):
+        """
+        Run the backend on decoded images, restricted to vehicle classes.
+        ประมวลผลโมเดลโดยจำกัดเฉพาะคลาสยานพาหนะ
+        
+        Non-vehicle candidates are dropped before NMS, so crowds of
+        pedestrians never reach post-processing or the host copy. With
+        tile_size set, each image is run as overlapping tiles.
+        """
+        classes = list(self.vehicle_classes)
+        
+        def predict(images):
+            return self.backend.predict(
+                images, self.conf_threshold, classes=classes, max_det=self.max_det
+            )
+        
+        if self.tile_size:
+            return predict_tiled(
+                predict, frames,
+                tile_size=self.tile_size,
+                overlap=self.tile_overlap,
+                batch_size=self.tile_batch,
+                max_det=self.max_det
+            )
+        return predict(frames)
+    
+    def detect_frames(self, frames, stages=None, rois=None):
+        """
+        Detect vehicles in a list of decoded images with one model call.
+        ตรวจจับยานพาหนะในรายการรูปภาพด้วยการเรียกโมเดลครั้งเดียว
+        
+        Args:
+            frames (list): BGR images as NumPy arrays
+            stages (list): One dict per frame that receives preprocess,
+                inference and postprocess times in ms (optional)
+            rois (list): One RegionOfInterest (or None) per frame; frames
+                are cropped to the region before inference (optional)
+        
+        With a result cache, frames found in the cache are answered from
+        it and only the others are sent to the model.
+        
+        Returns:
+            list: One Detections per input frame, in full-frame pixels
+        """
+        if rois is None:
+            rois = [None] * len(frames)
+        if stages is None:
+            stages = [None] * len(frames)
+        detections = [None] * len(frames)
+        cache_keys = [None] * len(frames)
+        if self.cache is not None:
+            # Reuse results of images seen before / ใช้ผลของรูปภาพที่เคยตรวจจับแล้ว
+            for i, (frame, roi, s) in enumerate(zip(frames, rois, stages)):
+                start = time.perf_counter()
+                hit, cache_keys[i] = self.cache.lookup(frame, self._cache_namespace(roi))
+                if hit is not None:
+                    detections[i] = Detections(*hit, self.vehicle_classes)
+                if s is not None:
+                    s['cache'] = _elapsed_ms(start)
+        
+        # Send each distinct uncached image once / ส่งรูปภาพที่ไม่ซ้ำกันเข้าโมเดลครั้งเดียว
+        todo, copies, first = [], [], {}
+        for i, d in enumerate(detections):
+            if d is not None:
+                continue
+            key = cache_keys[i]
+            if key is not None and key in first:
+                copies.append((i, first[key]))
+            else:
+                first[key] = i
+                todo.append(i)
+        if not todo:
+            return detections
+        # Only send the region's pixels to the model / ส่งเฉพาะพื้นที่ที่สนใจเข้าโมเดล
+        inputs = [
+            frames[i] if rois[i] is None else rois[i].crop(frames[i]) for i in todo
+        ]
+        results = self._predict(inputs)
+        for i, result in zip(todo, results):
+            frame_detections = self._postprocess(result, stages[i])
+            if rois[i] is not None:
+                frame_detections = rois[i].restore(frame_detections, frames[i].shape)
+            if self.cache is not None:
+                self.cache.store(
+                    cache_keys[i], frame_detections.boxes,
+                    frame_detections.confidences, frame_detections.class_ids
+                )
+            detections[i] = frame_detections
+        for i, source in copies:
+            d = detections[source]
+            detections[i] = Detections(
+                d.boxes.copy(), d.confidences.copy(), d.class_ids.copy(), d.class_names
+            )
+        return detections
+    
+    def detect_cars_in_image(self, image_path, output_path=None, show=True, roi=None,
+                             annotate=True):
+        """
+        Detect cars in an image.
+        ตรวจจับรถยนต์ในรูปภาพ
+        
+        Args:
+            image_path (str): Path to input image
+            output_path (str): Path to save output image (optional)
+            show (bool): Whether to display the result
+            roi (RegionOfInterest): Only detect inside this region (optional)
+            annotate (bool): Draw the boxes; with False, nothing is drawn
+                unless output_path or show needs it, and None is returned
+                instead of an image
+        
+        Returns:
+            tuple: (annotated_image, detections) where detections is a
+                Detections; use detections.to_dicts() for a plain list
+        """
+        stages = {}
+        
+        # Read image / อ่านรูปภาพ
+        start = time.perf_counter()
+        image = self._read_image(image_path)
+        stages['decode'] = _elapsed_ms(start)
+        
+        # Run inference and keep only vehicles / ตรวจจับและกรองเฉพาะยานพาหนะ
+        detections = self.detect_frames([image], [stages], [roi])[0]
+        
+        # Draw detections only if someone looks at them
+        # วาดกรอบการตรวจจับเฉพาะเมื่อมีการใช้ภาพผลลัพธ์
+        annotated_image = None
+        if annotate or output_path or show:
+            start = time.perf_counter()
+            annotated_image = self._draw_detections(image, detections)
+            stages['draw'] = _elapsed_ms(start)
         
         # Save output / บันทึกผลลัพธ์
         if output_path:
+            start = time.perf_counter()
             cv2.imwrite(str(output_path), annotated_image)
+            stages['encode'] = _elapsed_ms(start)
             print(f"Saved output to: {output_path}")
+        self._record_frame(stages, detections, source=image_path)
         
         # Display result / แสดงผลลัพธ์
         if show:
@@ -126,17 +439,155 @@ class CarDetector:
         
         return annotated_image, detections
     
-    def detect_cars_in_video(self, video_path, output_path=None, show=True):
+    def _prefetch_images(self, image_paths, prefetch, num_threads):
         """
-        Detect cars in a video.
-        ตรวจจับรถยนต์ในวิดีโอ
+        Decode images on background threads, keeping at most `prefetch`
+        images in flight. Yields (image_path, image, decode_ms) in input
+        order; image is None when the file cannot be read.
+        ถอดรหัสรูปภาพล่วงหน้าด้วยเธรดเบื้องหลัง
+        """
+        def read(path):
+            start = time.perf_counter()
+            try:
+                image = self._read_image(path)
+            except ValueError:
+                image = None
+            return image, _elapsed_ms(start)
+        
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            pending = deque()
+            for image_path in image_paths:
+                pending.append((image_path, executor.submit(read, image_path)))
+                if len(pending) >= prefetch:
+                    if self.metrics is not None:
+                        self.metrics.set_queue_depth('prefetch', len(pending))
+                    path, future = pending.popleft()
+                    yield (path,) + future.result()
+            while pending:
+                path, future = pending.popleft()
+                yield (path,) + future.result()
+    
+    def _start_image_decoders(self, image_paths, batch_size, processes):
+        """
+        Start `processes` decoder processes that read the images into
+        shared memory (see shared_frames.py).
+        เริ่มโปรเซสถอดรหัสรูปภาพลงในหน่วยความจำร่วม
+        
+        Returns:
+            SharedDecoders: Running decoders; close() them once the last
+                frame has been used
+        """
+        # Size the slots after the first image; larger ones go through the queue
+        # กำหนดขนาดช่องตามรูปแรก รูปที่ใหญ่กว่าจะส่งผ่านคิวแทน
+        first = cv2.imread(image_paths[0]) if image_paths else None
+        slot_bytes = first.nbytes if first is not None else 1920 * 1080 * 3
+        ring = SharedFrameRing(-(-batch_size // processes) + 2, slot_bytes, lanes=processes)
+        return SharedDecoders(
+            ring, decode_images, [(image_paths, lane) for lane in range(processes)]
+        )
+    
+    def detect_cars_in_images(self, image_paths, batch_size=8, output_dir=None,
+                              prefetch=None, num_threads=4, roi=None,
+                              decode_processes=0):
+        """
+        Detect cars in many images using batched inference.
+        ตรวจจับรถยนต์ในรูปภาพจำนวนมากด้วยการประมวลผลแบบแบตช์
+        
+        Images are decoded ahead of time on a small thread pool, stacked
+        into batches of `batch_size` and passed to the model in one call.
+        Results are yielded as soon as each batch finishes, so arbitrarily
+        long inputs can be processed with bounded memory.
         
         Args:
-            video_path (str): Path to input video or camera index (0 for webcam)
-            output_path (str): Path to save output video (optional)
-            show (bool): Whether to display the result
+            image_paths (iterable): Paths of the images to process
+            batch_size (int): Number of images per model call
+            output_dir (str): Directory to save annotated images (optional)
+            prefetch (int): Max images decoded ahead (default: 2 * batch_size)
+            num_threads (int): Number of decoding threads
+            roi (RegionOfInterest): Only detect inside this region, for
+                images from one fixed camera (optional)
+            decode_processes (int): Decode in this many processes instead
+                of threads; frames reach the model through shared memory
+                without being copied (see shared_frames.py)
+        
+        Yields:
+            tuple: (image_path, Detections) for each readable image
         """
-        # Open video / เปิดวิดีโอ
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if prefetch is None:
+            prefetch = 2 * batch_size
+        if output_dir:
+            output_dir = Path(output_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
+        
+        def run_batch(paths, images, stages):
+            # One model call for the whole batch / เรียกโมเดลครั้งเดียวต่อแบตช์
+            results = self.detect_frames(images, stages, [roi] * len(images))
+            for path, image, detections, frame_stages in zip(paths, images, results, stages):
+                if output_dir:
+                    start = time.perf_counter()
+                    annotated_image = self._draw_detections(image, detections)
+                    frame_stages['draw'] = _elapsed_ms(start)
+                    start = time.perf_counter()
+                    cv2.imwrite(str(output_dir / f"detected_{Path(path).name}"),
+                                annotated_image)
+                    frame_stages['encode'] = _elapsed_ms(start)
+                self._record_frame(frame_stages, detections, source=path)
+                yield path, detections
+        
+        decoders = None
+        if decode_processes > 0:
+            decoders = self._start_image_decoders(
+                [str(path) for path in image_paths], batch_size, decode_processes
+            )
+            decoded = (
+                (image_path, image, decode_ms, partial(decoders.ring.release, slot))
+                for slot, image, (image_path, decode_ms) in decoders.frames()
+            )
+        else:
+            decoded = (
+                item + (None,)
+                for item in self._prefetch_images(image_paths, prefetch, num_threads)
+            )
+        
+        def run_and_release(paths, images, stages, releases):
+            yield from run_batch(paths, images, stages)
+            # Hand shared-memory slots back / คืนช่องหน่วยความจำร่วม
+            for release in releases:
+                if release is not None:
+                    release()
+        
+        batch_paths, batch_images, batch_stages, batch_releases = [], [], [], []
+        try:
+            for image_path, image, decode_ms, release in decoded:
+                if image is None:
+                    print(f"Skipping {image_path}: cannot read image")
+                    continue
+                batch_paths.append(image_path)
+                batch_images.append(image)
+                batch_stages.append({'decode': decode_ms})
+                batch_releases.append(release)
+                if len(batch_images) == batch_size:
+                    yield from run_and_release(batch_paths, batch_images, batch_stages, batch_releases)
+                    batch_paths, batch_images, batch_stages, batch_releases = [], [], [], []
+            if batch_images:
+                yield from run_and_release(batch_paths, batch_images, batch_stages, batch_releases)
+        finally:
+            decoded.close()
+            if decoders is not None:
+                # Frees the shared memory, so only after the last batch
+                # คืนหน่วยความจำร่วมหลังแบตช์สุดท้ายเท่านั้น
+                decoders.close()
+    
+    @staticmethod
+    def _is_camera(video_path):
+        """True for a camera index or a network stream URL."""
+        video_path = str(video_path)
+        return video_path.isdigit() or '://' in video_path
+    
+    def _open_video(self, video_path):
+        """Open a video file or camera index, raising ValueError on failure."""
         if isinstance(video_path, int) or video_path.isdigit():
             cap = cv2.VideoCapture(int(video_path))
         else:
@@ -144,9 +595,174 @@ class CarDetector:
         
         if not cap.isOpened():
             raise ValueError(f"Cannot open video from {video_path}")
+        return cap
+    
+    def _draw_video_detections(self, frame, detections, info_text):
+        """
+        Draw boxes, labels and a status line onto a video frame in place.
+        วาดกรอบ ป้าย และข้อความสถานะลงบนเฟรมวิดีโอ
+        """
+        # Draw vehicles / วาดยานพาหนะ
+        track_ids = detections.track_ids
+        for i, (class_id, conf, (x1, y1, x2, y2)) in enumerate(zip(
+            detections.class_ids.tolist(),
+            detections.confidences.tolist(),
+            detections.boxes.tolist()
+        )):
+            label = f"{self.vehicle_classes[class_id]}: {conf:.2f}"
+            if track_ids is not None:
+                label = f"#{track_ids[i]} {label}"
+            
+            # Draw detection / วาดการตรวจจับ
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(
+                frame, label, (x1, y1 - 5),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2
+            )
+        
+        cv2.putText(
+            frame, info_text, (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2
+        )
+    
+    def _process_video_frame(self, frame, frame_count, gate=None, tracker=None,
+                             stages=None, roi=None, draw=True):
+        """
+        Run detection on one video frame and draw the results in place.
+        ตรวจจับและวาดผลลัพธ์ลงบนเฟรมวิดีโอหนึ่งเฟรม
+        
+        When a FrameGate is given and decides to skip the frame, the
+        detections from the last model run are drawn instead. When a
+        VehicleTracker is given, tracked boxes with ids are drawn and
+        skipped frames use the tracker's predicted positions. With a
+        RegionOfInterest, only the region is checked for motion and sent to
+        the model. Stage times are added to the `stages` dict when one is
+        given. With draw=False the frame is left untouched (headless runs
+        where nobody sees the frame).
+        
+        Returns:
+            Detections: The detections drawn on the frame
+        """
+        ran = gate is None or gate.should_detect(frame if roi is None else roi.crop(frame))
+        if ran:
+            # Run inference / ทำการตรวจจับ
+            detections = self.detect_frames(
+                [frame], None if stages is None else [stages], [roi]
+            )[0]
+            if gate is not None:
+                gate.detections = detections
+        elif self.metrics is not None:
+            self.metrics.frame_skipped()
+        
+        start = time.perf_counter()
+        if tracker is not None:
+            # Follow vehicles between detector runs / ติดตามยานพาหนะระหว่างการตรวจจับ
+            detections = tracker.step(detections if ran else None)
+            if stages is not None:
+                stages['track'] = _elapsed_ms(start)
+                start = time.perf_counter()
+        elif not ran:
+            # Reuse last detections / ใช้ผลการตรวจจับล่าสุดซ้ำ
+            detections = gate.detections
+        
+        if not draw:
+            return detections
+        
+        # Add frame info / เพิ่มข้อมูลเฟรม
+        info_text = f"Frame: {frame_count} | Vehicles: {len(detections)}"
+        if tracker is not None:
+            info_text += f" | Unique: {tracker.unique_count}"
+        if roi is not None:
+            roi.draw(frame)
+        self._draw_video_detections(frame, detections, info_text)
+        if stages is not None:
+            stages['draw'] = _elapsed_ms(start)
+        return detections
+    
+    def detect_cars_in_video(self, video_path, output_path=None, show=True,
+                             pipeline=False, queue_size=8, detect_every=1,
+                             motion_threshold=None, max_interval=None,
+                             motion_method='diff', track=False, roi=None,
+                             annotate=None, live=False, latency_budget_ms=None,
+                             fallbacks=None, decode_process=False):
+        """
+        Detect cars in a video.
+        ตรวจจับรถยนต์ในวิดีโอ
+        
+        Args:
+            video_path (str): Path to input video or camera index (0 for webcam)
+            output_path (str): Path to save output video (optional)
+            show (bool): Whether to display the result
+            pipeline (bool): Decode and encode frames on background threads
+                so they overlap with inference
+            queue_size (int): Max frames buffered between pipeline stages;
+                a full queue blocks the stage feeding it
+            detect_every (int): Run the model at most every N frames and
+                reuse the last detections in between
+            motion_threshold (float): Only run the model when at least this
+                fraction of pixels changed (optional, see FrameGate)
+            max_interval (int): Run the model at least every N frames when
+                motion gating is on (optional)
+            motion_method (str): 'diff' or 'mog2' motion detection
+            track (bool): Track vehicles across frames, draw track ids and
+                report the number of unique vehicles
+            roi (RegionOfInterest): Only detect inside this region of the
+                frame (optional, see roi.py)
+            annotate (bool): Draw boxes on the frames; None draws only when
+                the frames are shown or saved
+            live (bool): Always process the newest frame and drop the ones
+                that arrived meanwhile (cameras and streams; files are read
+                at their own frame rate to behave like a camera)
+            latency_budget_ms (float): Live mode only: drop frames older
+                than this before inference, and switch to the fallbacks
+                while the capture-to-result latency is over it (optional)
+            fallbacks (list): Cheaper CarDetectors (smaller input size or
+                model), fastest last, used in turn when over the latency
+                budget (optional)
+            decode_process (bool): Decode in a separate process that writes
+                frames into shared memory, `queue_size` frames ahead
+                (see shared_frames.py)
+        
+        Returns:
+            VehicleTracker: The tracker when track=True, otherwise None
+        """
+        gate = None
+        if detect_every > 1 or motion_threshold is not None:
+            gate = FrameGate(
+                detect_every=detect_every,
+                motion_threshold=motion_threshold,
+                max_interval=max_interval,
+                method=motion_method
+            )
+        tracker = VehicleTracker(self.vehicle_classes) if track else None
+        if annotate is None:
+            annotate = bool(show or output_path)
+        if (latency_budget_ms is not None or fallbacks) and not live:
+            raise ValueError("latency_budget_ms and fallbacks need live=True")
+        if fallbacks and latency_budget_ms is None:
+            raise ValueError("fallbacks need a latency_budget_ms")
+        if decode_process and (live or pipeline):
+            raise ValueError("decode_process cannot be combined with live or pipeline")
+        
+        levels = [self] + list(fallbacks or [])
+        controller = None
+        if latency_budget_ms is not None:
+            controller = LatencyController(latency_budget_ms, levels=len(levels))
+        
+        def process_frame(frame, frame_count, stages):
+            detector = levels[controller.level] if controller is not None else self
+            return detector._process_video_frame(
+                frame, frame_count, gate, tracker, stages, roi, annotate
+            )
+
+        # Open video / เปิดวิดีโอ
+        cap = self._open_video(video_path)
         
         # Get video properties / รับข้อมูลวิดีโอ
         fps = int(cap.get(cv2.CAP_PROP_FPS))
+        # Exact rate for row positions; cameras have no position
+        # อัตราเฟรมที่แท้จริงสำหรับตำแหน่งในวิดีโอ กล้องไม่มีตำแหน่ง
+        video_fps = None if self._is_camera(video_path) else cap.get(cv2.CAP_PROP_FPS) or None
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
@@ -156,121 +772,286 @@ class CarDetector:
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             writer = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
         
-        frame_count = 0
         print("Processing video... Press 'q' to quit")
         
+        try:
+            if decode_process:
+                # The decoder process opens the video itself
+                # โปรเซสถอดรหัสเปิดวิดีโอเอง
+                cap.release()
+                # Some streams report 0x0 until the first frame is read
+                # บางสตรีมรายงานขนาด 0x0 จนกว่าจะอ่านเฟรมแรก
+                frame_count = self._run_video_shared(
+                    video_path, width * height * 3 or 1920 * 1080 * 3, writer, show,
+                    queue_size, process_frame, video_fps
+                )
+            elif live:
+                frame_count = self._run_video_live(
+                    cap, writer, show, process_frame, video_path, controller,
+                    pace_fps=None if self._is_camera(video_path) else fps,
+                    fps=video_fps
+                )
+            elif pipeline:
+                frame_count = self._run_video_pipeline(
+                    cap, writer, show, queue_size, process_frame, video_path,
+                    video_fps
+                )
+            else:
+                frame_count = self._run_video_serial(
+                    cap, writer, show, process_frame, video_path, video_fps
+                )
+        finally:
+            # Cleanup / ทำความสะอาด
+            cap.release()
+            if writer:
+                writer.release()
+            cv2.destroyAllWindows()
+        
+        print(f"Processed {frame_count} frames")
+        if gate is not None:
+            print(f"Ran inference on {gate.frames_inferred} of {gate.frames_seen} frames")
+        if tracker is not None:
+            print(f"Counted {tracker.unique_count} unique vehicle(s): {tracker.unique_by_class}")
+        if output_path:
+            print(f"Saved output to: {output_path}")
+        return tracker
+    
+    def _run_video_serial(self, cap, writer, show, process_frame, source=None, fps=None):
+        """Read, detect and write frames one after another in this thread."""
+        frame_count = 0
         while True:
+            start = time.perf_counter()
             ret, frame = cap.read()
             if not ret:
                 break
+            stages = {'decode': _elapsed_ms(start)}
             
             frame_count += 1
-            
-            # Run inference / ทำการตรวจจับ
-            results = self.model(frame, conf=self.conf_threshold, verbose=False)
-            
-            # Filter and draw vehicles / กรองและวาดยานพาหนะ
-            vehicle_count = 0
-            for result in results:
-                for box in result.boxes:
-                    class_id = int(box.cls[0])
-                    if class_id in self.vehicle_classes:
-                        vehicle_count += 1
-                        conf = float(box.conf[0])
-                        x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                        label = f"{self.vehicle_classes[class_id]}: {conf:.2f}"
-                        
-                        # Draw detection / วาดการตรวจจับ
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        cv2.putText(
-                            frame, label, (x1, y1 - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2
-                        )
-            
-            # Add frame info / เพิ่มข้อมูลเฟรม
-            info_text = f"Frame: {frame_count} | Vehicles: {vehicle_count}"
-            cv2.putText(
-                frame, info_text, (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2
-            )
+            detections = process_frame(frame, frame_count, stages)
             
             # Save frame / บันทึกเฟรม
             if writer:
+                start = time.perf_counter()
                 writer.write(frame)
+                stages['encode'] = _elapsed_ms(start)
+            self._record_frame(stages, detections, frame_count, source, fps)
             
             # Display frame / แสดงเฟรม
             if show:
                 cv2.imshow('Car Detection', frame)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
-        
-        # Cleanup / ทำความสะอาด
-        cap.release()
-        if writer:
-            writer.release()
-        cv2.destroyAllWindows()
-        
-        print(f"Processed {frame_count} frames")
-        if output_path:
-            print(f"Saved output to: {output_path}")
-
-
-def main():
-    """Main function to run the car detector from command line."""
-    parser = argparse.ArgumentParser(
-        description='Car Object Detection using YOLOv8 / ตรวจจับรถยนต์ด้วย YOLOv8'
-    )
-    parser.add_argument(
-        '--input', '-i', type=str, required=True,
-        help='Path to input image/video or camera index (0 for webcam)'
-    )
-    parser.add_argument(
-        '--output', '-o', type=str, default=None,
-        help='Path to save output image/video'
-    )
-    parser.add_argument(
-        '--model', '-m', type=str, default='yolov8n.pt',
-        choices=['yolov8n.pt', 'yolov8s.pt', 'yolov8m.pt', 'yolov8l.pt', 'yolov8x.pt'],
-        help='YOLOv8 model size (n=nano, s=small, m=medium, l=large, x=xlarge)'
-    )
-    parser.add_argument(
-        '--conf', '-c', type=float, default=0.5,
-        help='Confidence threshold (0.0-1.0)'
-    )
-    parser.add_argument(
-        '--no-show', action='store_true',
-        help='Do not display the output'
-    )
-    parser.add_argument(
-        '--video', '-v', action='store_true',
-        help='Process as video instead of image'
-    )
+        return frame_count
     
-    args = parser.parse_args()
-    
-    # Create detector / สร้างตัวตรวจจับ
-    detector = CarDetector(model_name=args.model, conf_threshold=args.conf)
+    def _run_video_shared(self, video_path, slot_bytes, writer, show, queue_size,
+                          process_frame, fps=None):
+        """
+        Decode in another process and detect on frames in shared memory.
+        ถอดรหัสในอีกโปรเซส และตรวจจับบนเฟรมในหน่วยความจำร่วม
+        
+        The decoder process reads frames straight into `queue_size` shared
+        slots; this process draws on them in place, writes and shows them,
+        then hands the slot back, so no frame is pickled or copied between
+        the processes.
+        """
+        ring = SharedFrameRing(queue_size, slot_bytes)
+        decoders = SharedDecoders(ring, decode_video, [(video_path,)])
+        frame_count = 0
+        try:
+            for slot, frame, decode_ms in decoders.frames():
+                try:
+                    stages = {'decode': decode_ms}
+                    frame_count += 1
+                    detections = process_frame(frame, frame_count, stages)
+                    
+                    if writer:
+                        start = time.perf_counter()
+                        writer.write(frame)
+                        stages['encode'] = _elapsed_ms(start)
+                    self._record_frame(stages, detections, frame_count, video_path, fps)
+                    
+                    # Display frame / แสดงเฟรม
+                    if show:
+                        cv2.imshow('Car Detection', frame)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            break
+                finally:
+                    ring.release(slot)
+        finally:
+            decoders.close()
+        return frame_count
     
-    # Process input / ประมวลผลอินพุต
-    try:
-        if args.video:
-            detector.detect_cars_in_video(
-                args.input, 
-                output_path=args.output, 
-                show=not args.no_show
-            )
-        else:
-            detector.detect_cars_in_image(
-                args.input, 
-                output_path=args.output, 
-                show=not args.no_show
-            )
-    except Exception as e:
-        print(f"Error: {e}")
-        return 1
+    def _run_video_live(self, cap, writer, show, process_frame, source=None,
+                        controller=None, pace_fps=None, fps=None):
+        """
+        Process the newest frame only, dropping frames that went stale.
+        ประมวลผลเฉพาะเฟรมล่าสุด และทิ้งเฟรมที่เก่าเกินไป
+        
+        A LatestFrameGrabber reads the camera on its own thread, so OpenCV's
+        buffer never fills up and the frame handed to the model is at most
+        one capture interval old. Frames replaced before they were used, or
+        already older than the latency budget, count as dropped. The
+        capture-to-result time of each frame is recorded as the 'latency'
+        stage and fed to the LatencyController, which picks the detector for
+        the next frame.
+        """
+        grabber = LatestFrameGrabber(cap, pace_fps)
+        frame_count = 0
+        stale = 0
+        dropped = 0
+        try:
+            while True:
+                item = grabber.read()
+                if item is None:
+                    break
+                frame, captured, frame_number = item
+                if self.metrics is not None and grabber.dropped > dropped:
+                    self.metrics.frame_dropped(grabber.dropped - dropped)
+                dropped = grabber.dropped
+                age_ms = _elapsed_ms(captured)
+                if controller is not None and age_ms > controller.budget_ms:
+                    # Too old to be worth showing / เก่าเกินกว่าจะแสดงผล
+                    stale += 1
+                    if self.metrics is not None:
+                        self.metrics.frame_dropped()
+                    continue
+                stages = {'queue_wait': age_ms}
+                
+                frame_count += 1
+                detections = process_frame(frame, frame_number, stages)
+                
+                if writer:
+                    start = time.perf_counter()
+                    writer.write(frame)
+                    stages['encode'] = _elapsed_ms(start)
+                stages['latency'] = _elapsed_ms(captured)
+                if controller is not None:
+                    controller.observe(stages['latency'])
+                # Unix time of the capture / เวลาที่ถ่ายเฟรมนี้
+                captured_at = time.time() - (time.perf_counter() - captured)
+                self._record_frame(stages, detections, frame_number, source, fps, captured_at)
+                
+                # Display frame / แสดงเฟรม
+                if show:
+                    cv2.imshow('Car Detection', frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            grabber.close()
+        
+        print(f"Live: processed {frame_count} of {grabber.frames_read} frames, "
+              f"dropped {grabber.dropped + stale} ({stale} over the latency budget)")
+        if controller is not None and controller.level_changes:
+            print(f"Live: {controller.over_budget} frame(s) over budget, "
+                  f"{controller.level_changes} detector switch(es)")
+        return frame_count
     
-    return 0
-
-
-if __name__ == '__main__':
-    exit(main())
+    def _run_video_pipeline(self, cap, writer, show, queue_size, process_frame,
+                            source=None, fps=None):
+        """
+        Run decode -> inference -> encode as three overlapping stages.
+        ประมวลผลแบบไปป์ไลน์: อ่านเฟรม -> ตรวจจับ -> เขียนเฟรม
+        
+        A reader thread decodes frames into a bounded queue, this thread
+        runs inference and display (OpenCV windows must stay on the calling
+        thread), and a writer thread encodes annotated frames from a second
+        bounded queue. Full queues block the upstream stage, so memory stays
+        bounded when one stage is slower than the others.
+        """
+        frames = queue.Queue(maxsize=queue_size)
+        annotated = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        errors = []
+        
+        def put(q, item):
+            # Block while the queue is full, but give up once stopped
+            # รอเมื่อคิวเต็ม แต่หยุดเมื่อได้รับสัญญาณหยุด
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def read_frames():
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if not put(frames, (frame, _elapsed_ms(start))):
+                        return
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(frames, _END_OF_STREAM)
+        
+        def write_frames():
+            try:
+                while True:
+                    frame = annotated.get()
+                    if frame is _END_OF_STREAM:
+                        break
+                    start = time.perf_counter()
+                    writer.write(frame)
+                    if self.metrics is not None:
+                        self.metrics.observe('encode', _elapsed_ms(start))
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+        
+        reader_thread = threading.Thread(target=read_frames, daemon=True)
+        reader_thread.start()
+        writer_thread = None
+        if writer:
+            writer_thread = threading.Thread(target=write_frames, daemon=True)
+            writer_thread.start()
+        
+        frame_count = 0
+        try:
+            while not stop.is_set():
+                try:
+                    item = frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END_OF_STREAM:
+                    break
+                frame, decode_ms = item
+                stages = {'decode': decode_ms}
+                
+                frame_count += 1
+                detections = process_frame(frame, frame_count, stages)
+                
+                # Hand the frame to the writer / ส่งเฟรมให้ตัวเขียนวิดีโอ
+                if writer_thread and not put(annotated, frame):
+                    break
+                if self.metrics is not None:
+                    self.metrics.set_queue_depth('decoded', frames.qsize())
+                    self.metrics.set_queue_depth('annotated', annotated.qsize())
+                self._record_frame(stages, detections, frame_count, source, fps)
+                
+                # Display frame / แสดงเฟรม
+                if show:
+                    cv2.imshow('Car Detection', frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            if writer_thread:
+                # Let the writer drain what is queued, unless it has died
+                # ให้ตัวเขียนเขียนเฟรมที่ค้างอยู่ให้หมด เว้นแต่เธรดหยุดทำงานแล้ว
+                while writer_thread.is_alive():
+                    try:
+                        annotated.put(_END_OF_STREAM, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                writer_thread.join()
+            stop.set()
+            reader_thread.join()
+        
+        if errors:
+            raise errors[0]
+        return frame_count
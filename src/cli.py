@@ -0,0 +1,467 @@
+"""
+Command-line interface for the car detector
+ส่วนติดต่อบรรทัดคำสั่งของตัวตรวจจับรถยนต์
+
+Only the standard library is imported at module level. OpenCV, NumPy and
+the model code are imported after the arguments are parsed, so --help,
+usage errors and health checks return without loading them. Run through
+src/car_detector.py, which hands over to this module before its own heavy
+imports.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import argparse
+import sys
+
+from sinks import SINK_FORMATS, open_sink
+
+
+def build_parser():
+    """Build the argument parser for the detection command."""
+    parser = argparse.ArgumentParser(
+        description='Car Object Detection using YOLOv8 / ตรวจจับรถยนต์ด้วย YOLOv8',
+        epilog='Run "%(prog)s benchmark --help" for the throughput benchmark and '
+               '"%(prog)s quantize --help" to build INT8/FP16 models. '
+               '"%(prog)s serve --help" runs a resident detection server.'
+    )
+    parser.add_argument(
+        '--input', '-i', type=str, required=True,
+        help='Path to input image/video or camera index (0 for webcam)'
+    )
+    parser.add_argument(
+        '--output', '-o', type=str, default=None,
+        help='Path to save output image/video'
+    )
+    parser.add_argument(
+        '--model', '-m', type=str, default='yolov8n.pt',
+        help='YOLOv8 model size (yolov8n/s/m/l/x.pt: n=nano, s=small, m=medium, '
+             'l=large, x=xlarge) or an exported/quantized model file'
+    )
+    parser.add_argument(
+        '--backend', type=str, default='auto',
+        help='Inference engine: auto, torch, onnx, openvino or torchscript; '
+             'onnx/openvino/torchscript export the model once to models/ '
+             '(default: auto)'
+    )
+    parser.add_argument(
+        '--threads', type=int, default=None,
+        help='CPU threads used for inference (default: library default)'
+    )
+    parser.add_argument(
+        '--imgsz', type=int, default=640,
+        help='Model input size (default 640)'
+    )
+    parser.add_argument(
+        '--warmup', action='store_true',
+        help='Run dummy frames after loading so the first frame is not slower'
+    )
+    parser.add_argument(
+        '--conf', '-c', type=float, default=0.5,
+        help='Confidence threshold (0.0-1.0)'
+    )
+    parser.add_argument(
+        '--max-det', type=int, default=300,
+        help='Maximum vehicles kept per image/frame'
+    )
+    parser.add_argument(
+        '--tile-size', type=int, default=None,
+        help='Detect on overlapping tiles of this size (for 4K/high-res input)'
+    )
+    parser.add_argument(
+        '--tile-overlap', type=float, default=0.2,
+        help='Fraction of a tile shared with its neighbour (with --tile-size)'
+    )
+    parser.add_argument(
+        '--no-show', action='store_true',
+        help='Do not display the output'
+    )
+    parser.add_argument(
+        '--video', '-v', action='store_true',
+        help='Process as video instead of image'
+    )
+    parser.add_argument(
+        '--pipeline', action='store_true',
+        help='Overlap video decoding, inference and encoding on separate threads'
+    )
+    parser.add_argument(
+        '--queue-size', type=int, default=8,
+        help='Frames buffered between pipeline stages (with --pipeline)'
+    )
+    parser.add_argument(
+        '--detect-every', type=int, default=1,
+        help='Run the model every N video frames and reuse detections in between'
+    )
+    parser.add_argument(
+        '--motion-threshold', type=float, default=None,
+        help='Only run the model when this fraction of pixels changed (0.0-1.0)'
+    )
+    parser.add_argument(
+        '--max-interval', type=int, default=None,
+        help='With --motion-threshold, run the model at least every N frames'
+    )
+    parser.add_argument(
+        '--motion-method', type=str, default='diff', choices=['diff', 'mog2'],
+        help='Motion detection method for --motion-threshold'
+    )
+    parser.add_argument(
+        '--track', action='store_true',
+        help='Track vehicles across video frames and count unique vehicles'
+    )
+    parser.add_argument(
+        '--live', action='store_true',
+        help='Live camera mode: always process the newest frame and drop stale ones'
+    )
+    parser.add_argument(
+        '--latency-budget', type=float, default=None,
+        help='With --live, maximum capture-to-result latency in ms; older frames '
+             'are dropped and the fallbacks are used while it is exceeded'
+    )
+    parser.add_argument(
+        '--fallback-imgsz', type=str, default=None,
+        help='With --latency-budget, comma-separated smaller input sizes to '
+             'fall back to under load, e.g. 480,320'
+    )
+    parser.add_argument(
+        '--fallback-model', type=str, default=None,
+        help='With --latency-budget, a smaller model used as the last fallback'
+    )
+    parser.add_argument(
+        '--streams', action='store_true',
+        help='Process several videos/cameras with one shared model; --input is a '
+             'comma-separated list or a .txt file of sources, --output a folder'
+    )
+    parser.add_argument(
+        '--roi', type=str, default=None,
+        help='Region of interest: JSON polygon file or mask image; with '
+             '--streams, a comma-separated list with one file per source'
+    )
+    parser.add_argument(
+        '--cache', type=str, default=None,
+        help='SQLite file of cached results; images seen before (same model '
+             'and settings) skip inference'
+    )
+    parser.add_argument(
+        '--cache-size', type=int, default=4096,
+        help='Results kept in memory in front of --cache'
+    )
+    parser.add_argument(
+        '--cache-phash-distance', type=int, default=None,
+        help='With --cache, also reuse results of near-duplicate images whose '
+             'perceptual hash differs by at most this many bits (0-3)'
+    )
+    parser.add_argument(
+        '--save-detections', type=str, default=None,
+        help='Stream every detection as a row to a .jsonl, .arrow or .parquet '
+             'file (Arrow/Parquet need pyarrow)'
+    )
+    parser.add_argument(
+        '--detections-format', type=str, default=None, choices=SINK_FORMATS,
+        help='Format for --save-detections (default: from the file suffix)'
+    )
+    parser.add_argument(
+        '--metrics-jsonl', type=str, default=None,
+        help='Append per-frame stage timings as JSON lines to this file'
+    )
+    parser.add_argument(
+        '--metrics-prom', type=str, default=None,
+        help='Write Prometheus text-format metrics to this file when done'
+    )
+    parser.add_argument(
+        '--batch', '-b', action='store_true',
+        help='Process a folder (or .txt list) of images in batches; '
+             '--output is then a folder'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help='Worker processes for batch mode or chunked video; each loads '
+             'the model once'
+    )
+    parser.add_argument(
+        '--chunk-frames', type=int, default=None,
+        help='With --video, split the file into chunks of N frames processed by '
+             '--workers processes; interrupted runs resume (default with '
+             '--workers: 4 chunks per worker)'
+    )
+    parser.add_argument(
+        '--work-dir', type=str, default=None,
+        help='Folder for chunk files and the resume checkpoint '
+             '(default: <output or input>.chunks)'
+    )
+    parser.add_argument(
+        '--keep-chunks', action='store_true',
+        help='Keep the chunk folder after the video is stitched together'
+    )
+    parser.add_argument(
+        '--manifest', type=str, default=None,
+        help='With --workers, file of completed images for resuming an interrupted run'
+    )
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help='With --workers, report results as soon as any worker finishes'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=None,
+        help='Number of images/frames per inference call in batch or streams '
+             'mode (default: 8 images, or one frame per stream)'
+    )
+    parser.add_argument(
+        '--decode-processes', type=int, default=0,
+        help='Decode in separate processes and pass frames through shared '
+             'memory: N processes in batch mode, one for video'
+    )
+    return parser
+
+
+def main(argv=None):
+    """Main function to run the car detector from command line."""
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    # Subcommand: benchmark / คำสั่งย่อย: วัดประสิทธิภาพ
+    if argv and argv[0] == 'benchmark':
+        from benchmark import main as benchmark_main
+        return benchmark_main(argv[1:])
+    
+    # Subcommand: quantize / คำสั่งย่อย: ควอนไทซ์โมเดล
+    if argv and argv[0] == 'quantize':
+        from quantize import main as quantize_main
+        return quantize_main(argv[1:])
+    
+    # Subcommand: serve / คำสั่งย่อย: เซิร์ฟเวอร์ตรวจจับ
+    if argv and argv[0] == 'serve':
+        from server import main as server_main
+        return server_main(argv[1:])
+    
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    # Heavy imports only now that a detection mode has been chosen
+    # นำเข้าโมดูลขนาดใหญ่หลังจากแยกอาร์กิวเมนต์แล้วเท่านั้น
+    from backends import BACKENDS
+    if args.backend not in BACKENDS:
+        parser.error(f"argument --backend: invalid choice: '{args.backend}' "
+                     f"(choose from {', '.join(BACKENDS)})")
+    from car_detector import CarDetector, collect_image_paths
+    from metrics import JsonLinesWriter, Metrics
+    from multi_stream import MultiStreamRunner
+    from parallel import WorkerStats, detect_images_parallel
+    from video_chunks import detect_video_chunked
+    from result_cache import ResultCache
+    from roi import RegionOfInterest
+    
+    # Create detector / สร้างตัวตรวจจับ
+    # (worker processes load their own copy in --workers mode)
+    parallel_batch = args.workers > 1 and not (args.video or args.streams)
+    chunked_video = args.video and not args.streams and (
+        args.chunk_frames is not None or args.workers > 1
+    )
+    if chunked_video and (args.track or args.detect_every > 1 or args.motion_threshold):
+        parser.error("chunked video (--workers/--chunk-frames) cannot use --track, "
+                     "--detect-every or --motion-threshold")
+    if args.live and (not args.video or args.streams or args.pipeline or chunked_video):
+        parser.error("--live needs --video and cannot be combined with --streams, "
+                     "--pipeline, --workers or --chunk-frames")
+    if args.decode_processes and (
+        args.streams or parallel_batch or chunked_video or args.live or args.pipeline
+        or not (args.batch or args.video)
+    ):
+        parser.error("--decode-processes works with --batch or --video and cannot be "
+                     "combined with --streams, --workers, --chunk-frames, --live or --pipeline")
+    if (args.latency_budget is not None or args.fallback_imgsz or args.fallback_model) \
+            and not args.live:
+        parser.error("--latency-budget, --fallback-imgsz and --fallback-model need --live")
+    if (args.fallback_imgsz or args.fallback_model) and args.latency_budget is None:
+        parser.error("--fallback-imgsz and --fallback-model need --latency-budget")
+    try:
+        fallback_sizes = [int(size) for size in (args.fallback_imgsz or '').split(',') if size.strip()]
+    except ValueError:
+        parser.error("--fallback-imgsz must be a comma-separated list of sizes")
+    metrics = None
+    metrics_writer = None
+    if args.metrics_jsonl or args.metrics_prom:
+        metrics = Metrics()
+        if args.metrics_jsonl:
+            metrics_writer = JsonLinesWriter(args.metrics_jsonl)
+            metrics.add_callback(metrics_writer)
+    sink = None
+    if args.save_detections:
+        try:
+            sink = open_sink(args.save_detections, args.detections_format)
+        except (ImportError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+    cache = None
+    if args.cache:
+        try:
+            cache = ResultCache(
+                args.cache, max_entries=args.cache_size,
+                phash_distance=args.cache_phash_distance
+            )
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return 1
+    detector = None
+    if not (parallel_batch or chunked_video):
+        detector = CarDetector(
+            model_name=args.model, conf_threshold=args.conf, metrics=metrics,
+            backend=args.backend, threads=args.threads, imgsz=args.imgsz,
+            max_det=args.max_det, tile_size=args.tile_size,
+            tile_overlap=args.tile_overlap, sink=sink, warmup=args.warmup,
+            cache=cache
+        )
+    fallbacks = []
+    if args.live:
+        # Cheaper detectors for overload, warmed up so the first switch is
+        # not slow / ตัวตรวจจับสำรองที่เร็วกว่า อุ่นเครื่องไว้ล่วงหน้า
+        fallback_specs = [(args.model, size) for size in fallback_sizes]
+        if args.fallback_model:
+            fallback_specs.append((args.fallback_model, min(fallback_sizes or [args.imgsz])))
+        for model_name, imgsz in fallback_specs:
+            fallbacks.append(CarDetector(
+                model_name=model_name, conf_threshold=args.conf, metrics=metrics,
+                backend=args.backend, threads=args.threads, imgsz=imgsz,
+                max_det=args.max_det, tile_size=args.tile_size,
+                tile_overlap=args.tile_overlap, warmup=True, cache=cache
+            ))
+    
+    # Process input / ประมวลผลอินพุต
+    try:
+        if args.streams:
+            if args.input.lower().endswith('.txt'):
+                sources = collect_image_paths(args.input)
+            else:
+                sources = [source.strip() for source in args.input.split(',') if source.strip()]
+            rois = None
+            if args.roi:
+                roi_files = [path.strip() for path in args.roi.split(',')]
+                if len(roi_files) == 1:
+                    roi_files = roi_files * len(sources)
+                rois = [RegionOfInterest.from_file(path) if path else None for path in roi_files]
+            runner = MultiStreamRunner(
+                detector, sources,
+                batch_size=args.batch_size,
+                output_dir=args.output,
+                rois=rois
+            )
+            for _ in runner.run():
+                pass
+            runner.print_stats()
+        elif args.batch or parallel_batch:
+            roi = RegionOfInterest.from_file(args.roi) if args.roi else None
+            image_paths = collect_image_paths(args.input)
+            batch_size = args.batch_size or 8
+            if parallel_batch:
+                worker_stats = WorkerStats()
+                results = detect_images_parallel(
+                    image_paths,
+                    workers=args.workers,
+                    model_name=args.model,
+                    conf_threshold=args.conf,
+                    batch_size=batch_size,
+                    output_dir=args.output,
+                    ordered=not args.unordered,
+                    manifest_path=args.manifest,
+                    stats=worker_stats,
+                    roi=roi,
+                    backend=args.backend,
+                    imgsz=args.imgsz,
+                    max_det=args.max_det,
+                    tile_size=args.tile_size,
+                    tile_overlap=args.tile_overlap,
+                    warmup=args.warmup,
+                    cache=cache
+                )
+            else:
+                results = detector.detect_cars_in_images(
+                    image_paths,
+                    batch_size=batch_size,
+                    output_dir=args.output,
+                    roi=roi,
+                    decode_processes=args.decode_processes
+                )
+            total = 0
+            for image_path, detections in results:
+                total += 1
+                if parallel_batch and sink is not None:
+                    # Workers have no sink; write in this process
+                    # โปรเซสย่อยไม่มีตัวเขียน จึงเขียนผลในโปรเซสหลัก
+                    sink.write(detections, source=image_path)
+                print(f"{image_path}: {len(detections)} vehicle(s)")
+            print(f"Processed {total} of {len(image_paths)} images")
+            if parallel_batch:
+                worker_stats.print_summary()
+        elif chunked_video:
+            worker_stats = WorkerStats()
+            detect_video_chunked(
+                args.input,
+                output_path=args.output,
+                workers=args.workers,
+                chunk_frames=args.chunk_frames,
+                work_dir=args.work_dir,
+                model_name=args.model,
+                conf_threshold=args.conf,
+                sink=sink,
+                roi=RegionOfInterest.from_file(args.roi) if args.roi else None,
+                batch_size=args.batch_size or 8,
+                keep_chunks=args.keep_chunks,
+                stats=worker_stats,
+                backend=args.backend,
+                imgsz=args.imgsz,
+                max_det=args.max_det,
+                tile_size=args.tile_size,
+                tile_overlap=args.tile_overlap,
+                warmup=args.warmup,
+                cache=cache
+            )
+            worker_stats.print_summary()
+        elif args.video:
+            detector.detect_cars_in_video(
+                args.input, 
+                output_path=args.output, 
+                show=not args.no_show,
+                pipeline=args.pipeline,
+                queue_size=args.queue_size,
+                detect_every=args.detect_every,
+                motion_threshold=args.motion_threshold,
+                max_interval=args.max_interval,
+                motion_method=args.motion_method,
+                track=args.track,
+                roi=RegionOfInterest.from_file(args.roi) if args.roi else None,
+                live=args.live,
+                latency_budget_ms=args.latency_budget,
+                fallbacks=fallbacks,
+                decode_process=args.decode_processes > 0
+            )
+        else:
+            detector.detect_cars_in_image(
+                args.input, 
+                output_path=args.output, 
+                show=not args.no_show,
+                roi=RegionOfInterest.from_file(args.roi) if args.roi else None,
+                # Draw only when the image is saved or shown / วาดเฉพาะเมื่อบันทึกหรือแสดงภาพ
+                annotate=bool(args.output) or not args.no_show
+            )
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if cache is not None:
+            if detector is not None:
+                # Workers keep their own counters / โปรเซสลูกนับสถิติแยกกัน
+                cache.print_stats()
+            cache.close()
+        if sink is not None:
+            sink.close()
+            print(f"Saved {sink.rows_written} detection(s) to: {args.save_detections}")
+        if metrics_writer:
+            metrics_writer.close()
+        if metrics is not None and args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
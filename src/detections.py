@@ -0,0 +1,154 @@
+"""
+Columnar container for vehicle detections
+คอนเทนเนอร์แบบคอลัมน์สำหรับผลการตรวจจับยานพาหนะ
+
+Detections are stored as three parallel NumPy arrays instead of a list of
+dicts, which keeps per-frame results small and makes aggregation across
+many frames cheap.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import numpy as np
+
+
+class Detections:
+    """
+    Vehicle detections for one image, stored column by column.
+    ผลการตรวจจับยานพาหนะของรูปภาพหนึ่งภาพ เก็บแยกเป็นคอลัมน์
+
+    Attributes:
+        boxes (np.ndarray): int32 array of shape (N, 4) with x1, y1, x2, y2
+        confidences (np.ndarray): float32 array of shape (N,)
+        class_ids (np.ndarray): uint8 array of shape (N,)
+        class_names (dict): Mapping from class id to class name
+        track_ids (np.ndarray): int32 array of shape (N,) with tracker ids,
+            or None when the detections are not tracked
+
+    Indexing with an integer returns a detection dict (the format used by
+    earlier versions of CarDetector), so existing loops such as
+    ``for det in detections: det['class_name']`` keep working. Indexing
+    with a slice returns a new Detections that shares memory with this one;
+    indexing with a boolean mask or index array returns a copy.
+    """
+
+    __slots__ = ('boxes', 'confidences', 'class_ids', 'class_names', 'track_ids')
+
+    def __init__(self, boxes, confidences, class_ids, class_names=None, track_ids=None):
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.uint8).reshape(-1)
+        self.class_names = class_names if class_names is not None else {}
+        self.track_ids = None
+        if track_ids is not None:
+            self.track_ids = np.asarray(track_ids, dtype=np.int32).reshape(-1)
+
+        if not len(self.boxes) == len(self.confidences) == len(self.class_ids):
+            raise ValueError("boxes, confidences and class_ids must have the same length")
+        if self.track_ids is not None and len(self.track_ids) != len(self.class_ids):
+            raise ValueError("track_ids must have the same length as the detections")
+
+    @classmethod
+    def empty(cls, class_names=None):
+        """Create a Detections with no entries."""
+        return cls(
+            np.empty((0, 4), dtype=np.int32),
+            np.empty(0, dtype=np.float32),
+            np.empty(0, dtype=np.uint8),
+            class_names
+        )
+
+    @classmethod
+    def concatenate(cls, items, class_names=None):
+        """
+        Join several Detections into one.
+        รวม Detections หลายชุดเป็นชุดเดียว
+        """
+        items = list(items)
+        if not items:
+            return cls.empty(class_names)
+        if class_names is None:
+            class_names = items[0].class_names
+        track_ids = None
+        if all(d.track_ids is not None for d in items):
+            track_ids = np.concatenate([d.track_ids for d in items])
+        return cls(
+            np.concatenate([d.boxes for d in items]),
+            np.concatenate([d.confidences for d in items]),
+            np.concatenate([d.class_ids for d in items]),
+            class_names,
+            track_ids
+        )
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._to_dict(index)
+        return Detections(
+            self.boxes[index],
+            self.confidences[index],
+            self.class_ids[index],
+            self.class_names,
+            self.track_ids[index] if self.track_ids is not None else None
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._to_dict(i)
+
+    def __repr__(self):
+        return f"Detections(n={len(self)})"
+
+    def _to_dict(self, i):
+        class_id = int(self.class_ids[i])
+        det = {
+            'class_id': class_id,
+            'class_name': self.class_names.get(class_id, str(class_id)),
+            'confidence': float(self.confidences[i]),
+            'bbox': self.boxes[i].tolist()
+        }
+        if self.track_ids is not None:
+            det['track_id'] = int(self.track_ids[i])
+        return det
+
+    def filter(self, classes=None, min_confidence=None):
+        """
+        Select detections by class and/or confidence.
+        เลือกการตรวจจับตามคลาสและ/หรือความมั่นใจ
+
+        Args:
+            classes (iterable): Class ids or class names to keep (optional)
+            min_confidence (float): Minimum confidence to keep (optional)
+
+        Returns:
+            Detections: The matching detections
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if classes is not None:
+            name_to_id = {name: class_id for class_id, name in self.class_names.items()}
+            ids = [name_to_id.get(c, -1) if isinstance(c, str) else int(c) for c in classes]
+            mask &= np.isin(self.class_ids, ids)
+        if min_confidence is not None:
+            mask &= self.confidences >= min_confidence
+        return self[mask]
+
+    def count_by_class(self):
+        """
+        Count detections per class name.
+        นับจำนวนการตรวจจับแยกตามชื่อคลาส
+        """
+        ids, counts = np.unique(self.class_ids, return_counts=True)
+        return {
+            self.class_names.get(int(class_id), str(class_id)): int(count)
+            for class_id, count in zip(ids, counts)
+        }
+
+    def to_dicts(self):
+        """
+        Convert to a list of detection dicts (JSON serializable).
+        แปลงเป็นรายการ dict ของการตรวจจับ (บันทึกเป็น JSON ได้)
+        """
+        return [self._to_dict(i) for i in range(len(self))]
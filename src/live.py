@@ -0,0 +1,179 @@
+"""
+Live camera helpers: newest-frame grabbing and latency control
+ตัวช่วยสำหรับกล้องสด: อ่านเฉพาะเฟรมล่าสุดและควบคุมความหน่วง
+
+When inference is slower than the camera, OpenCV buffers frames and every
+result gets older. For live dashboards the newest frame matters more than
+every frame:
+  * LatestFrameGrabber reads the camera on its own thread and keeps only
+    the newest frame; frames replaced before they were used are counted
+    as dropped
+  * LatencyController watches the capture-to-result latency and steps down
+    to a cheaper detector (smaller input size or model) when it exceeds
+    the budget, and back up once there is headroom again
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import threading
+import time
+
+
+class LatestFrameGrabber:
+    """
+    Read frames on a background thread and hand out only the newest one.
+    อ่านเฟรมบนเธรดเบื้องหลังและส่งต่อเฉพาะเฟรมล่าสุด
+    """
+
+    def __init__(self, cap, pace_fps=None):
+        """
+        Args:
+            cap (cv2.VideoCapture): Opened camera or stream
+            pace_fps (float): Read at most this many frames per second, so a
+                video file behaves like a live camera (optional)
+        """
+        self.cap = cap
+        self.pace_fps = pace_fps
+        self.frames_read = 0
+        self.dropped = 0
+        self.error = None
+        self._frame = None
+        self._ended = False
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_time = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                ret, frame = self.cap.read()
+                captured = time.perf_counter()
+                with self._cond:
+                    if not ret:
+                        break
+                    self.frames_read += 1
+                    if self._frame is not None:
+                        # Nobody used the previous frame / เฟรมก่อนหน้าไม่ได้ถูกใช้
+                        self.dropped += 1
+                    self._frame = (frame, captured, self.frames_read)
+                    self._cond.notify_all()
+                if self.pace_fps:
+                    next_time += 1.0 / self.pace_fps
+                    time.sleep(max(0.0, next_time - time.perf_counter()))
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    def read(self, warn_after=5.0):
+        """
+        Wait for a frame newer than the last one returned.
+        รอเฟรมใหม่ที่ยังไม่เคยถูกส่งออก
+
+        A stalled camera does not end the stream: while the reader thread
+        is alive this keeps waiting and prints a warning every `warn_after`
+        seconds without a frame.
+
+        Returns:
+            tuple: (frame, capture time from time.perf_counter(), frame
+                number), or None once the stream has ended
+        """
+        waited = 0.0
+        with self._cond:
+            while not self._cond.wait_for(
+                lambda: self._frame is not None or self._ended, warn_after
+            ):
+                waited += warn_after
+                print(f"Live: no frame from the camera for {waited:.0f} s, still waiting")
+            item, self._frame = self._frame, None
+        if item is None and self.error is not None:
+            raise self.error
+        return item
+
+    def close(self, timeout=1.0):
+        """
+        Stop the reader thread.
+
+        A thread stuck in cap.read() on a stalled camera is unblocked by
+        releasing the capture; after `timeout` more seconds it is left
+        behind (it is a daemon thread).
+        """
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Still inside cap.read() / ยังค้างอยู่ใน cap.read()
+            self.cap.release()
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print("Live: camera reader did not stop, leaving it behind")
+
+
+class LatencyController:
+    """
+    Pick a detector level from the measured end-to-end latency.
+    เลือกระดับตัวตรวจจับจากความหน่วงที่วัดได้
+
+    Level 0 is the full detector; higher levels are cheaper fallbacks. The
+    controller keeps an exponential moving average of the latency, steps
+    down one level when it is over budget and steps back up after
+    `recover_frames` frames in a row below `recover_ratio` of the budget.
+    The average carries over a level change, and no further change is made
+    for `settle_frames` frames, so the average can follow the new level
+    instead of one slow frame stepping down through every level.
+    """
+
+    def __init__(self, budget_ms, levels=1, alpha=0.2, recover_ratio=0.6, recover_frames=30,
+                 settle_frames=10):
+        if budget_ms <= 0:
+            raise ValueError("budget_ms must be positive")
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.alpha = alpha
+        self.recover_ratio = recover_ratio
+        self.recover_frames = recover_frames
+        self.settle_frames = settle_frames
+        self.level = 0
+        self.average_ms = None
+        self.over_budget = 0
+        self.level_changes = 0
+        self._fast_frames = 0
+        self._since_change = settle_frames
+
+    def observe(self, latency_ms):
+        """
+        Record one frame's latency and return the level for the next frame.
+        บันทึกความหน่วงของหนึ่งเฟรมและคืนค่าระดับสำหรับเฟรมถัดไป
+        """
+        if latency_ms > self.budget_ms:
+            self.over_budget += 1
+        if self.average_ms is None:
+            self.average_ms = latency_ms
+        else:
+            self.average_ms += self.alpha * (latency_ms - self.average_ms)
+        self._since_change += 1
+        if self._since_change <= self.settle_frames:
+            # Let the average follow the last change / รอให้ค่าเฉลี่ยปรับตามระดับใหม่
+            return self.level
+
+        if self.average_ms > self.budget_ms and self.level < self.levels - 1:
+            self._change(self.level + 1)
+        elif self.average_ms < self.recover_ratio * self.budget_ms and self.level > 0:
+            self._fast_frames += 1
+            if self._fast_frames >= self.recover_frames:
+                self._change(self.level - 1)
+        else:
+            self._fast_frames = 0
+        return self.level
+
+    def _change(self, level):
+        print(f"Live: average latency {self.average_ms:.0f} ms, "
+              f"switching to level {level} of {self.levels - 1}")
+        self.level = level
+        self.level_changes += 1
+        self._fast_frames = 0
+        self._since_change = 0
@@ -0,0 +1,223 @@
+"""
+Runtime metrics for CarDetector
+ตัวชี้วัดขณะทำงานของ CarDetector
+
+A Metrics object receives per-frame stage timings, detection counts, queue
+depths and dropped frames from the detector. It keeps Prometheus-style
+counters and histograms in memory, forwards every frame to registered
+callbacks, and can export everything without a running metrics server:
+  * to_prometheus() / write_prometheus() for the Prometheus text format
+    (e.g. node_exporter's textfile collector)
+  * JsonLinesWriter, a callback that appends one JSON object per frame
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import json
+import os
+import threading
+import time
+
+
+# Histogram bucket upper bounds in milliseconds / ขอบเขตของฮิสโตแกรม (มิลลิวินาที)
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class _Histogram:
+    """Cumulative histogram of millisecond durations."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms):
+        self.count += 1
+        self.sum += ms
+        for i, bound in enumerate(self.buckets):
+            if ms <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """
+    Collect detector metrics and fan them out to callbacks.
+    รวบรวมตัวชี้วัดของตัวตรวจจับและส่งต่อให้ callback
+
+    Example:
+        metrics = Metrics()
+        metrics.add_callback(JsonLinesWriter('frames.jsonl'))
+        detector = CarDetector(metrics=metrics)
+        detector.detect_cars_in_video('traffic.mp4', show=False)
+        metrics.write_prometheus('car_detector.prom')
+    """
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS, prefix='car_detector'):
+        self.prefix = prefix
+        self.buckets_ms = tuple(buckets_ms)
+        self.frames = 0
+        self.detections = 0
+        self.dropped_frames = 0
+        self.skipped_frames = 0
+        self.stages = {}
+        self.queue_depths = {}
+        self.started = time.time()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """
+        Register a function called with an event dict for every frame.
+        ลงทะเบียนฟังก์ชันที่จะถูกเรียกทุกเฟรม
+
+        The event has the keys 'time', 'source', 'frame', 'stages_ms',
+        'detections' and 'queue_depths'.
+        """
+        self._callbacks.append(callback)
+
+    def observe(self, stage, ms):
+        """Record one duration for a stage that is not tied to a frame."""
+        with self._lock:
+            self._observe(stage, ms)
+
+    def _observe(self, stage, ms):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = _Histogram(self.buckets_ms)
+        histogram.observe(ms)
+
+    def record_frame(self, stages_ms, detections=0, frame=None, source=None):
+        """
+        Record the stage timings and detection count of one frame.
+        บันทึกเวลาแต่ละขั้นตอนและจำนวนการตรวจจับของหนึ่งเฟรม
+
+        Args:
+            stages_ms (dict): Stage name -> duration in milliseconds
+            detections (int): Vehicles detected in the frame
+            frame (int): Frame index (optional)
+            source (str): Image path or video source (optional)
+        """
+        with self._lock:
+            self.frames += 1
+            self.detections += detections
+            for stage, ms in stages_ms.items():
+                self._observe(stage, ms)
+            queue_depths = dict(self.queue_depths)
+        if self._callbacks:
+            event = {
+                'time': time.time(),
+                'source': None if source is None else str(source),
+                'frame': frame,
+                'stages_ms': dict(stages_ms),
+                'detections': detections,
+                'queue_depths': queue_depths,
+            }
+            for callback in self._callbacks:
+                callback(event)
+
+    def frame_dropped(self, count=1):
+        """Count frames discarded without being processed."""
+        with self._lock:
+            self.dropped_frames += count
+
+    def frame_skipped(self, count=1):
+        """Count frames where inference was skipped and results reused."""
+        with self._lock:
+            self.skipped_frames += count
+
+    def set_queue_depth(self, name, depth):
+        """Update the current depth of a named queue."""
+        with self._lock:
+            self.queue_depths[name] = depth
+
+    def summary(self):
+        """
+        Return totals and mean stage times as a plain dict.
+        คืนค่าผลรวมและเวลาเฉลี่ยแต่ละขั้นตอน
+        """
+        with self._lock:
+            elapsed = time.time() - self.started
+            return {
+                'frames': self.frames,
+                'detections': self.detections,
+                'dropped_frames': self.dropped_frames,
+                'skipped_frames': self.skipped_frames,
+                'fps': self.frames / elapsed if elapsed > 0 else 0.0,
+                'stages_ms': {
+                    stage: h.sum / h.count for stage, h in self.stages.items() if h.count
+                },
+                'queue_depths': dict(self.queue_depths),
+            }
+
+    def to_prometheus(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+        แปลงตัวชี้วัดทั้งหมดเป็นรูปแบบข้อความของ Prometheus
+        """
+        p = self.prefix
+        lines = []
+
+        def counter(name, help_text, value):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} counter")
+            lines.append(f"{p}_{name} {value}")
+
+        with self._lock:
+            counter('frames_total', 'Frames processed.', self.frames)
+            counter('detections_total', 'Vehicles detected.', self.detections)
+            counter('dropped_frames_total', 'Frames discarded without processing.',
+                    self.dropped_frames)
+            counter('skipped_frames_total', 'Frames that reused earlier detections.',
+                    self.skipped_frames)
+
+            lines.append(f"# HELP {p}_stage_seconds Time spent per processing stage.")
+            lines.append(f"# TYPE {p}_stage_seconds histogram")
+            for stage, h in sorted(self.stages.items()):
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(
+                        f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {count}'
+                    )
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {h.sum / 1000:.6f}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+            lines.append(f"# HELP {p}_queue_depth Items waiting in internal queues.")
+            lines.append(f"# TYPE {p}_queue_depth gauge")
+            for name, depth in sorted(self.queue_depths.items()):
+                lines.append(f'{p}_queue_depth{{queue="{name}"}} {depth}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Atomically write the Prometheus text format to a file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+class JsonLinesWriter:
+    """
+    Metrics callback that appends one JSON object per frame to a file.
+    callback ที่เขียน JSON หนึ่งบรรทัดต่อหนึ่งเฟรมลงไฟล์
+    """
+
+    def __init__(self, path, flush_every=100):
+        self._file = open(path, 'a')
+        self._flush_every = flush_every
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self._flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,214 @@
+"""
+Run one shared detector over many video sources
+ประมวลผลวิดีโอหลายแหล่งด้วยตัวตรวจจับเดียวที่ใช้ร่วมกัน
+
+Each source is decoded on its own thread. Frames from all sources are
+collected into cross-stream batches for a single model call and the
+results are routed back to the stream they came from.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+
+class StreamStats:
+    """
+    Frame and throughput counters for one source.
+    ตัวนับเฟรมและอัตราการประมวลผลของแหล่งวิดีโอหนึ่งแหล่ง
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.frames = 0
+        self.vehicles = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def fps(self):
+        """Processed frames per second since the stream started."""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        elapsed = end - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+
+class MultiStreamRunner:
+    """
+    Batch frames from several video sources through one CarDetector.
+    รวมเฟรมจากหลายแหล่งวิดีโอเป็นแบตช์และส่งเข้า CarDetector ตัวเดียว
+
+    Example:
+        runner = MultiStreamRunner(detector, ['cam1.mp4', 'rtsp://...'])
+        for stream_index, frame_index, frame, detections in runner.run():
+            ...
+    """
+
+    def __init__(self, detector, sources, batch_size=None, max_wait=0.01,
+                 queue_size=None, output_dir=None, rois=None):
+        """
+        Args:
+            detector (CarDetector): Shared detector (model is loaded once)
+            sources (list): Video paths, URLs or camera indexes
+            batch_size (int): Max frames per model call (default: one per source)
+            max_wait (float): Seconds to wait for more frames before running
+                a partial batch
+            queue_size (int): Max decoded frames waiting for inference
+                (default: 2 * batch_size)
+            output_dir (str): Folder for annotated per-stream videos (optional)
+            rois (list): One RegionOfInterest (or None) per source (optional)
+        """
+        if not sources:
+            raise ValueError("At least one source is required")
+        if rois is not None and len(rois) != len(sources):
+            raise ValueError("rois must have one entry per source")
+        self.detector = detector
+        self.sources = list(sources)
+        self.batch_size = batch_size or len(self.sources)
+        self.max_wait = max_wait
+        self.queue_size = queue_size or 2 * self.batch_size
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.rois = list(rois) if rois is not None else [None] * len(self.sources)
+        self.stats = [StreamStats(source) for source in self.sources]
+
+    def _read_stream(self, index, cap, frames, stop):
+        """Decode one source into the shared frame queue."""
+        frame_index = 0
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                decode_ms = (time.perf_counter() - start) * 1000
+                frame_index += 1
+                while not stop.is_set():
+                    try:
+                        frames.put((index, frame_index, frame, decode_ms), timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        finally:
+            cap.release()
+            # End-of-stream marker / เครื่องหมายสิ้นสุดสตรีม
+            while not stop.is_set():
+                try:
+                    frames.put((index, None, None, 0.0), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def _open_writer(self, index, cap):
+        """Create the annotated output video for one stream."""
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        path = self.output_dir / f"stream_{index}.mp4"
+        return cv2.VideoWriter(str(path), fourcc, fps, (width, height))
+
+    def _next_batch(self, frames):
+        """Block for one frame, then gather more until full or max_wait passes."""
+        batch = [frames.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(frames.get(timeout=remaining))
+                else:
+                    batch.append(frames.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        """
+        Process all sources until every stream ends.
+        ประมวลผลทุกแหล่งจนกว่าทุกสตรีมจะสิ้นสุด
+
+        Yields:
+            tuple: (stream_index, frame_index, frame, detections); annotated
+                in place when output_dir is set
+        """
+        caps = [self.detector._open_video(source) for source in self.sources]
+        # Frame rates for row positions; cameras have none / กล้องไม่มีตำแหน่งในวิดีโอ
+        rates = [
+            None if self.detector._is_camera(source) else cap.get(cv2.CAP_PROP_FPS) or None
+            for source, cap in zip(self.sources, caps)
+        ]
+        writers = [None] * len(caps)
+        if self.output_dir:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            writers = [self._open_writer(i, cap) for i, cap in enumerate(caps)]
+
+        frames = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        readers = [
+            threading.Thread(target=self._read_stream, args=(i, cap, frames, stop), daemon=True)
+            for i, cap in enumerate(caps)
+        ]
+        for stats in self.stats:
+            stats.started = time.perf_counter()
+        for reader in readers:
+            reader.start()
+
+        metrics = self.detector.metrics
+        active = len(readers)
+        try:
+            while active:
+                batch = self._next_batch(frames)
+                if metrics is not None:
+                    metrics.set_queue_depth('streams', frames.qsize())
+                items = []
+                for index, frame_index, frame, decode_ms in batch:
+                    if frame is None:
+                        active -= 1
+                        self.stats[index].finished = time.perf_counter()
+                    else:
+                        items.append((index, frame_index, frame, {'decode': decode_ms}))
+                if not items:
+                    continue
+
+                # One model call across streams / เรียกโมเดลครั้งเดียวสำหรับทุกสตรีม
+                results = self.detector.detect_frames(
+                    [item[2] for item in items], [item[3] for item in items],
+                    [self.rois[item[0]] for item in items]
+                )
+                for (index, frame_index, frame, stages), detections in zip(items, results):
+                    stats = self.stats[index]
+                    stats.frames += 1
+                    stats.vehicles += len(detections)
+                    if writers[index] is not None:
+                        start = time.perf_counter()
+                        info_text = f"Stream: {index} | Frame: {frame_index} | Vehicles: {len(detections)}"
+                        if self.rois[index] is not None:
+                            self.rois[index].draw(frame)
+                        self.detector._draw_video_detections(frame, detections, info_text)
+                        stages['draw'] = (time.perf_counter() - start) * 1000
+                        start = time.perf_counter()
+                        writers[index].write(frame)
+                        stages['encode'] = (time.perf_counter() - start) * 1000
+                    self.detector._record_frame(
+                        stages, detections, frame_index, self.sources[index], rates[index]
+                    )
+                    yield index, frame_index, frame, detections
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+            for writer in writers:
+                if writer is not None:
+                    writer.release()
+
+    def print_stats(self):
+        """Print per-stream frame counts and FPS."""
+        for index, stats in enumerate(self.stats):
+            print(f"Stream {index} ({stats.source}): {stats.frames} frames, "
+                  f"{stats.vehicles} detections, {stats.fps:.1f} FPS")
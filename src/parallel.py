@@ -0,0 +1,189 @@
+"""
+Process-pool sharding for large image collections
+การแบ่งงานรูปภาพจำนวนมากให้หลายโปรเซส
+
+The image list is cut into chunks that are handed to a pool of worker
+processes. Each worker loads its own CarDetector once and runs batched
+inference on every chunk it receives.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+
+# Detector owned by the current worker process / ตัวตรวจจับของโปรเซสนี้
+_worker_detector = None
+_worker_batch_size = 8
+_worker_output_dir = None
+_worker_roi = None
+
+
+def _init_worker(model_name, conf_threshold, batch_size, output_dir, threads,
+                 roi, detector_options):
+    """Load the model once per worker process."""
+    global _worker_detector, _worker_batch_size, _worker_output_dir, _worker_roi
+    # Limit inference threads so several workers do not oversubscribe cores
+    # จำกัดจำนวนเธรดเพื่อป้องกันการแย่งคอร์ CPU เมื่อหลายโปรเซสทำงานพร้อมกัน
+    from car_detector import CarDetector
+    _worker_detector = CarDetector(
+        model_name=model_name, conf_threshold=conf_threshold, threads=threads,
+        **detector_options
+    )
+    _worker_batch_size = batch_size
+    _worker_output_dir = output_dir
+    _worker_roi = roi
+
+
+def _process_chunk(image_paths):
+    """Run batched detection on one chunk inside a worker."""
+    start = time.perf_counter()
+    results = list(_worker_detector.detect_cars_in_images(
+        image_paths,
+        batch_size=_worker_batch_size,
+        output_dir=_worker_output_dir,
+        roi=_worker_roi
+    ))
+    if _worker_detector.cache is not None:
+        # Workers are never closed, so write cached results per chunk
+        # โปรเซสลูกไม่ได้ถูกปิดอย่างเป็นทางการ จึงบันทึกแคชทุกชุดงาน
+        _worker_detector.cache.flush()
+    return os.getpid(), len(image_paths), time.perf_counter() - start, results
+
+
+class WorkerStats:
+    """
+    Images and busy time per worker process.
+    จำนวนรูปภาพและเวลาทำงานของแต่ละโปรเซส
+    """
+
+    def __init__(self):
+        self.images = {}
+        self.seconds = {}
+
+    def add(self, pid, images, seconds):
+        self.images[pid] = self.images.get(pid, 0) + images
+        self.seconds[pid] = self.seconds.get(pid, 0.0) + seconds
+
+    def print_summary(self):
+        """Print images and images/second for each worker."""
+        for pid in sorted(self.images):
+            seconds = self.seconds[pid]
+            rate = self.images[pid] / seconds if seconds > 0 else 0.0
+            print(f"Worker {pid}: {self.images[pid]} images, {rate:.1f} images/s")
+
+
+def _read_manifest(manifest_path):
+    """Return the set of paths already recorded as completed."""
+    if not manifest_path or not Path(manifest_path).exists():
+        return set()
+    with open(manifest_path, 'r') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def detect_images_parallel(image_paths, workers, model_name='yolov8n.pt',
+                           conf_threshold=0.5, batch_size=8, chunk_size=None,
+                           output_dir=None, ordered=True, manifest_path=None,
+                           stats=None, roi=None, **detector_options):
+    """
+    Detect cars in many images using a pool of worker processes.
+    ตรวจจับรถยนต์ในรูปภาพจำนวนมากด้วยกลุ่มโปรเซส
+
+    Args:
+        image_paths (list): Paths of the images to process
+        workers (int): Number of worker processes
+        model_name (str): YOLOv8 model loaded by each worker
+        conf_threshold (float): Confidence threshold for detections
+        batch_size (int): Images per inference call inside a worker
+        chunk_size (int): Images sent to a worker at a time
+            (default: 4 * batch_size)
+        output_dir (str): Directory to save annotated images (optional)
+        ordered (bool): Yield results in input order; when False, results
+            are yielded as soon as any worker finishes a chunk
+        manifest_path (str): File listing completed images, one per line.
+            Images already listed are skipped and new ones are appended,
+            so an interrupted run can be resumed (optional)
+        stats (WorkerStats): Collects per-worker throughput (optional)
+        roi (RegionOfInterest): Only detect inside this region (optional)
+        **detector_options: Other CarDetector arguments for the workers,
+            e.g. backend, imgsz, max_det or tile_size
+
+    Yields:
+        tuple: (image_path, Detections) for each readable image
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    chunk_size = chunk_size or 4 * batch_size
+    stats = stats if stats is not None else WorkerStats()
+
+    done = _read_manifest(manifest_path)
+    pending_paths = [str(p) for p in image_paths if str(p) not in done]
+    if done:
+        print(f"Resuming: skipping {len(image_paths) - len(pending_paths)} completed image(s)")
+    chunks = [pending_paths[i:i + chunk_size] for i in range(0, len(pending_paths), chunk_size)]
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    backend = detector_options.get('backend', 'auto')
+    if backend not in ('auto', 'torch') and Path(model_name).suffix == '.pt':
+        # Export once here rather than racing in every worker
+        # ส่งออกโมเดลครั้งเดียวก่อนเริ่มโปรเซสลูก
+        from backends import export_model
+        model_name = str(export_model(model_name, backend, detector_options.get('imgsz', 640)))
+    # Spawn keeps PyTorch state from leaking into the workers
+    # ใช้ spawn เพื่อไม่ให้สถานะของ PyTorch ติดไปยังโปรเซสลูก
+    context = multiprocessing.get_context('spawn')
+    manifest = open(manifest_path, 'a') if manifest_path else None
+
+    def finish(future):
+        pid, count, seconds, results = future.result()
+        stats.add(pid, count, seconds)
+        return results
+
+    def record(chunk):
+        if manifest:
+            manifest.write(''.join(f"{path}\n" for path in chunk))
+            manifest.flush()
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, conf_threshold, batch_size, output_dir, threads, roi, detector_options)
+        ) as executor:
+            # Keep a bounded number of chunks in flight / จำกัดจำนวนงานที่ส่งค้างไว้
+            chunk_iter = iter(chunks)
+            in_flight = deque()
+            max_in_flight = 2 * workers
+
+            def submit_next():
+                chunk = next(chunk_iter, None)
+                if chunk is not None:
+                    in_flight.append((chunk, executor.submit(_process_chunk, chunk)))
+
+            for _ in range(max_in_flight):
+                submit_next()
+
+            while in_flight:
+                if ordered:
+                    chunk, future = in_flight.popleft()
+                else:
+                    wait([f for _, f in in_flight], return_when=FIRST_COMPLETED)
+                    index = next(i for i, (_, f) in enumerate(in_flight) if f.done())
+                    chunk, future = in_flight[index]
+                    del in_flight[index]
+                results = finish(future)
+                submit_next()
+                yield from results
+                record(chunk)
+    finally:
+        if manifest:
+            manifest.close()
@@ -0,0 +1,394 @@
+"""
+Quantized INT8 / FP16 models for CarDetector
+การสร้างโมเดลแบบ INT8 / FP16 สำหรับ CarDetector
+
+Converts the FP32 ONNX export of a YOLOv8 model into a smaller, faster
+model and reports what it costs:
+  * 'int8-dynamic' - weights stored as INT8, no calibration needed
+  * 'int8-static'  - weights and activations in INT8, calibrated on a
+                     folder of your own frames (usually the fastest on CPU)
+  * 'fp16'         - weights stored in half precision (half the file
+                     size; ONNX Runtime still computes in FP32 on CPU)
+
+The result is a plain .onnx file, so CarDetector loads it like any other
+exported model:
+    detector = CarDetector('models/yolov8n_640_int8_static.onnx')
+
+Usage:
+    python src/car_detector.py quantize --model yolov8s.pt --mode int8-static \
+        --calib frames/ --eval frames/ --json quant.json
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from backends import export_model, letterbox
+from box_ops import box_iou
+
+
+MODES = ('int8-dynamic', 'int8-static', 'fp16')
+
+
+def _quantized_path(fp32_path, mode):
+    """Cache location of a quantized model next to its FP32 export."""
+    fp32_path = Path(fp32_path)
+    return fp32_path.with_name(f"{fp32_path.stem}_{mode.replace('-', '_')}.onnx")
+
+
+def _model_size_mb(path):
+    """Size of a model file, or of all files in a model folder."""
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file()) / 1e6
+    return path.stat().st_size / 1e6
+
+
+def _head_nodes(model_path):
+    """
+    Names of the detection head nodes, which are kept in FP32 because
+    quantizing the box and class outputs costs the most accuracy.
+    """
+    import onnx
+
+    model = onnx.load(str(model_path))
+    outputs = {o.name for o in model.graph.output}
+    # The head is the last module of the graph, e.g. "/model.22/..."
+    # ส่วนหัวของโมเดลคือโมดูลสุดท้ายในกราฟ
+    prefixes = [n.name.split('/')[1] for n in model.graph.node
+                if n.name.startswith('/model.') and set(n.output) & outputs]
+    if not prefixes:
+        return []
+    head = f"/{prefixes[0]}/"
+    return [n.name for n in model.graph.node if n.name.startswith(head)]
+
+
+def _convert_weights_fp16(fp32_path, target):
+    """Store float weights as FP16, cast back to FP32 when the model loads."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    model = onnx.load(str(fp32_path))
+    graph = model.graph
+    casts = []
+    for initializer in list(graph.initializer):
+        if initializer.data_type != TensorProto.FLOAT or np.prod(initializer.dims) < 16:
+            continue
+        half = numpy_helper.from_array(
+            numpy_helper.to_array(initializer).astype(np.float16), f"{initializer.name}_fp16"
+        )
+        graph.initializer.remove(initializer)
+        graph.initializer.append(half)
+        casts.append(helper.make_node(
+            'Cast', [half.name], [initializer.name],
+            to=TensorProto.FLOAT, name=f"{initializer.name}_cast"
+        ))
+    for cast in reversed(casts):
+        graph.node.insert(0, cast)
+    onnx.save(model, str(target))
+
+
+def _calibration_reader(image_paths, input_name, imgsz):
+    """Feed letterboxed calibration frames to the ONNX Runtime calibrator."""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(str(path))
+                if image is not None:
+                    return {input_name: letterbox([image], imgsz)[0]}
+            return None
+
+    return FrameReader()
+
+
+def quantize_model(model_name, mode='int8-dynamic', calibration_images=None,
+                   imgsz=640, cache_dir=None, max_calibration_images=200):
+    """
+    Create (or reuse) a quantized ONNX model.
+    สร้างโมเดลแบบควอนไทซ์ หรือใช้ไฟล์ที่สร้างไว้แล้ว
+
+    Args:
+        model_name (str): YOLOv8 .pt weights or an FP32 .onnx export
+        mode (str): One of MODES
+        calibration_images (list): Image paths for 'int8-static'; use frames
+            that look like your real input
+        imgsz (int): Model input size
+        cache_dir (str): Folder for exported models (default: models/)
+        max_calibration_images (int): Calibration frames actually used
+
+    Returns:
+        Path: The quantized .onnx file
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown quantization mode: {mode} (choose from {', '.join(MODES)})")
+    if mode == 'int8-static' and not calibration_images:
+        raise ValueError("int8-static quantization needs calibration images")
+
+    fp32_path = Path(model_name)
+    if fp32_path.suffix != '.onnx':
+        fp32_path = export_model(model_name, 'onnx', imgsz, cache_dir)
+    target = _quantized_path(fp32_path, mode)
+    if target.exists():
+        return target
+
+    print(f"Quantizing {fp32_path} ({mode}) ...")
+    try:
+        if mode == 'fp16':
+            _convert_weights_fp16(fp32_path, target)
+        else:
+            from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+            if mode == 'int8-dynamic':
+                quantize_dynamic(
+                    str(fp32_path), str(target),
+                    weight_type=QuantType.QUInt8,
+                    op_types_to_quantize=['Conv', 'MatMul']
+                )
+            else:
+                import onnxruntime as ort
+
+                session = ort.InferenceSession(str(fp32_path), providers=['CPUExecutionProvider'])
+                input_name = session.get_inputs()[0].name
+                quantize_static(
+                    str(fp32_path), str(target),
+                    _calibration_reader(calibration_images[:max_calibration_images], input_name, imgsz),
+                    quant_format=QuantFormat.QDQ,
+                    per_channel=True,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    nodes_to_exclude=_head_nodes(fp32_path)
+                )
+    except ImportError as e:
+        raise ImportError(f"{mode} quantization needs ONNX Runtime: pip install onnx onnxruntime") from e
+    print(f"Saved quantized model to: {target}")
+    return target
+
+
+def _average_precision(is_tp, scores, num_ground_truth):
+    """Area under the interpolated precision/recall curve."""
+    order = np.argsort(-scores, kind='stable')
+    is_tp = is_tp[order]
+    tp = np.cumsum(is_tp)
+    fp = np.cumsum(~is_tp)
+    recall = tp / num_ground_truth
+    precision = tp / np.maximum(tp + fp, 1)
+
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.nonzero(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def vehicle_map(predictions, ground_truth, class_names, iou_threshold=0.5):
+    """
+    Mean average precision over vehicle classes.
+    ค่า mAP ของคลาสยานพาหนะ
+
+    Args:
+        predictions (list): One Detections per image
+        ground_truth (list): One Detections per image
+        class_names (dict): Classes to score, id -> name
+        iou_threshold (float): IoU needed for a true positive
+
+    Returns:
+        dict: {'map': float, 'per_class': {name: AP}}; classes without
+            ground truth boxes are left out
+    """
+    per_class = {}
+    for class_id, name in class_names.items():
+        is_tp, scores, num_ground_truth = [], [], 0
+        for pred, truth in zip(predictions, ground_truth):
+            pred = pred[pred.class_ids == class_id]
+            truth = truth[truth.class_ids == class_id]
+            num_ground_truth += len(truth)
+            if not len(pred):
+                continue
+            order = np.argsort(-pred.confidences, kind='stable')
+            matched = np.zeros(len(truth), dtype=bool)
+            iou = box_iou(pred.boxes[order], truth.boxes) if len(truth) else None
+            for row in range(len(order)):
+                hit = False
+                if iou is not None:
+                    candidates = np.where(matched, -1.0, iou[row])
+                    best = int(candidates.argmax())
+                    if candidates[best] >= iou_threshold:
+                        matched[best] = hit = True
+                is_tp.append(hit)
+            scores.append(pred.confidences[order])
+        if num_ground_truth:
+            per_class[name] = _average_precision(
+                np.array(is_tp, dtype=bool),
+                np.concatenate(scores) if scores else np.empty(0),
+                num_ground_truth
+            ) if is_tp else 0.0
+    mean = float(np.mean(list(per_class.values()))) if per_class else 0.0
+    return {'map': mean, 'per_class': per_class}
+
+
+def _read_labels(label_dir, image_path, image_shape, class_names):
+    """Read YOLO-format labels (class cx cy w h, normalized) as Detections."""
+    from detections import Detections
+
+    label_path = Path(label_dir) / f"{Path(image_path).stem}.txt"
+    rows = np.loadtxt(label_path, ndmin=2) if label_path.exists() else np.empty((0, 5))
+    if not len(rows):
+        return Detections.empty(class_names)
+    height, width = image_shape[:2]
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return Detections(boxes, np.ones(len(rows)), rows[:, 0], class_names)
+
+
+def _run_model(detector, images, warmup):
+    """Detect on every image one at a time, returning results and mean latency."""
+    for image in images[:warmup]:
+        detector.detect_frames([image])
+    results, elapsed = [], 0.0
+    for image in images:
+        start = time.perf_counter()
+        results.append(detector.detect_frames([image])[0])
+        elapsed += time.perf_counter() - start
+    return results, elapsed * 1000 / max(len(images), 1)
+
+
+def evaluate_quantization(reference, candidate, image_paths, labels_dir=None,
+                          conf_threshold=0.5, imgsz=640, threads=None, warmup=3):
+    """
+    Compare a quantized model against its FP32 reference.
+    เปรียบเทียบโมเดลที่ควอนไทซ์กับโมเดล FP32 ต้นฉบับ
+
+    Without labels, the reference model's detections above conf_threshold
+    are used as ground truth, so the reported mAP is agreement with FP32.
+
+    Args:
+        reference (str): FP32 model path
+        candidate (str): Quantized model path
+        image_paths (list): Evaluation images
+        labels_dir (str): YOLO-format label files named after the images
+            (optional)
+        conf_threshold (float): Confidence for pseudo ground truth
+        imgsz (int): Model input size
+        threads (int): CPU threads for inference (optional)
+        warmup (int): Images run before timing
+
+    Returns:
+        dict: Latency, size and vehicle mAP@0.5 of both models and deltas
+    """
+    from car_detector import CarDetector
+
+    loaded = [(path, cv2.imread(str(path))) for path in image_paths]
+    loaded = [(path, image) for path, image in loaded if image is not None]
+    images = [image for _, image in loaded]
+    if not images:
+        raise ValueError("No readable evaluation images")
+
+    report = {'images': len(images), 'ground_truth': 'labels' if labels_dir else 'reference'}
+    predictions = {}
+    for key, model_path in (('reference', reference), ('candidate', candidate)):
+        # Low threshold so the whole precision/recall curve is scored
+        # ใช้ค่าความมั่นใจต่ำเพื่อคำนวณกราฟ precision/recall ทั้งหมด
+        detector = CarDetector(str(model_path), conf_threshold=0.001, threads=threads, imgsz=imgsz)
+        predictions[key], latency_ms = _run_model(detector, images, warmup)
+        report[key] = {
+            'model': str(model_path),
+            'latency_ms': latency_ms,
+            'size_mb': _model_size_mb(model_path),
+        }
+    class_names = detector.vehicle_classes
+
+    if labels_dir:
+        ground_truth = [_read_labels(labels_dir, path, image.shape, class_names)
+                        for path, image in loaded]
+    else:
+        ground_truth = [d.filter(min_confidence=conf_threshold) for d in predictions['reference']]
+    for key in ('reference', 'candidate'):
+        report[key]['map50'] = vehicle_map(predictions[key], ground_truth, class_names)
+
+    report['map50_delta'] = report['candidate']['map50']['map'] - report['reference']['map50']['map']
+    report['speedup'] = report['reference']['latency_ms'] / max(report['candidate']['latency_ms'], 1e-9)
+    return report
+
+
+def print_report(report):
+    """Print a quantization report."""
+    print(f"\nEvaluated on {report['images']} image(s), ground truth: {report['ground_truth']}")
+    print(f"{'':<11}{'latency ms':>12}{'size MB':>10}{'mAP@0.5':>10}  model")
+    for key in ('reference', 'candidate'):
+        r = report[key]
+        print(f"{key:<11}{r['latency_ms']:>12.1f}{r['size_mb']:>10.1f}{r['map50']['map']:>10.3f}  {r['model']}")
+    print(f"Speed-up: {report['speedup']:.2f}x, mAP@0.5 delta: {report['map50_delta']:+.3f}")
+    for name, ap in report['candidate']['map50']['per_class'].items():
+        reference_ap = report['reference']['map50']['per_class'].get(name, 0.0)
+        print(f"  {name}: {ap:.3f} ({ap - reference_ap:+.3f})")
+
+
+def main(argv=None):
+    """Command line entry point for quantization."""
+    from car_detector import collect_image_paths
+
+    parser = argparse.ArgumentParser(
+        prog='car_detector.py quantize',
+        description='Quantize a model and report its speed and accuracy / ควอนไทซ์โมเดลและรายงานผล'
+    )
+    parser.add_argument('--model', '-m', type=str, default='yolov8n.pt',
+                        help='YOLOv8 .pt weights or FP32 .onnx export')
+    parser.add_argument('--mode', type=str, default='int8-dynamic', choices=MODES,
+                        help='Quantization mode')
+    parser.add_argument('--calib', type=str, default=None,
+                        help='Folder or .txt list of calibration frames (int8-static)')
+    parser.add_argument('--eval', type=str, default=None,
+                        help='Folder or .txt list of images for the accuracy/latency report '
+                             '(default: the calibration frames)')
+    parser.add_argument('--labels', type=str, default=None,
+                        help='Folder of YOLO-format labels for --eval images (optional)')
+    parser.add_argument('--max-images', type=int, default=200,
+                        help='Max calibration/evaluation images used')
+    parser.add_argument('--imgsz', type=int, default=640, help='Model input size')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for inference')
+    parser.add_argument('--conf', '-c', type=float, default=0.5,
+                        help='Confidence for FP32 pseudo ground truth when no labels are given')
+    parser.add_argument('--json', type=str, default=None, help='Write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    calibration = collect_image_paths(args.calib)[:args.max_images] if args.calib else None
+    try:
+        quantized = quantize_model(args.model, args.mode, calibration, imgsz=args.imgsz,
+                                   max_calibration_images=args.max_images)
+        eval_source = args.eval or args.calib
+        if not eval_source:
+            print("No --eval images given, skipping the accuracy report")
+            return 0
+        reference = args.model if Path(args.model).suffix == '.onnx' else \
+            export_model(args.model, 'onnx', args.imgsz)
+        report = evaluate_quantization(
+            reference, quantized, collect_image_paths(eval_source)[:args.max_images],
+            labels_dir=args.labels, conf_threshold=args.conf,
+            imgsz=args.imgsz, threads=args.threads
+        )
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to: {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
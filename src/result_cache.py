@@ -0,0 +1,406 @@
+"""
+Result cache for repeated and near-duplicate images
+แคชผลการตรวจจับสำหรับรูปภาพที่ซ้ำหรือเกือบซ้ำ
+
+Archives and static cameras contain many identical or nearly identical
+images. The cache sits in front of inference and returns stored
+detections instead of running the model:
+  * exact match: BLAKE2 hash of the decoded pixels
+  * near match (optional): 64-bit difference hash (dHash) within a small
+    Hamming distance, for re-encoded or slightly noisy copies. Only entries
+    sharing one of the hash's four 16-bit bands are compared (an index in
+    memory, indexed columns on disk), so a miss costs a few dict and index
+    lookups plus one Hamming distance per candidate, not a scan of the cache
+
+Entries are keyed by a namespace that the detector builds from everything
+that changes its output (model, backend, confidence, input size, region of
+interest, ...), so results from different settings never mix.
+
+Two tiers:
+  * memory: LRU dict of the most recent entries
+  * disk (optional): SQLite file, memory-mapped for reads, shared between
+    runs and worker processes; least recently used rows are evicted when it
+    grows past max_disk_entries
+
+Disk writes (new results and last-used times) are buffered and written in
+one short transaction every FLUSH_EVERY writes or FLUSH_SECONDS seconds,
+and by flush() / close(); other processes see a result once it is flushed.
+The row count is checked for eviction every EVICT_CHECK_EVERY stored rows,
+so the file can run that many rows over max_disk_entries in between.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+# A near match must share one of four 16-bit bands with the stored hash,
+# which is guaranteed for Hamming distances up to 3
+# ค่าแฮชแบ่งเป็น 4 ส่วน ส่วนละ 16 บิต จึงค้นหาระยะห่างได้ไม่เกิน 3 บิต
+MAX_PHASH_DISTANCE = 3
+_BANDS = 4
+
+# Disk write batching / การรวมการเขียนลงดิสก์
+FLUSH_EVERY = 64
+FLUSH_SECONDS = 5.0
+EVICT_CHECK_EVERY = 1024
+
+
+def image_digest(image):
+    """Exact content hash of a decoded image (pixels and shape)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image):
+    """
+    64-bit difference hash: compare neighbouring pixels of a 9x8 thumbnail.
+    ค่าแฮชเชิงการรับรู้ขนาด 64 บิตจากภาพย่อขนาด 9x8
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def _hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _bands(phash):
+    if phash is None:
+        return [None] * _BANDS
+    return [(phash >> (16 * i)) & 0xFFFF for i in range(_BANDS)]
+
+
+def _to_sqlite_int(value):
+    """Store an unsigned 64-bit hash in SQLite's signed INTEGER."""
+    if value is None:
+        return None
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _pack(boxes, confidences, class_ids):
+    return (
+        np.int32(len(boxes)).tobytes() + boxes.astype(np.int32).tobytes() +
+        confidences.astype(np.float32).tobytes() + class_ids.astype(np.uint8).tobytes()
+    )
+
+
+def _unpack(payload):
+    count = int(np.frombuffer(payload, dtype=np.int32, count=1)[0])
+    offset = 4
+    boxes = np.frombuffer(payload, dtype=np.int32, count=count * 4, offset=offset).reshape(-1, 4)
+    offset += count * 16
+    confidences = np.frombuffer(payload, dtype=np.float32, count=count, offset=offset)
+    offset += count * 4
+    class_ids = np.frombuffer(payload, dtype=np.uint8, count=count, offset=offset)
+    return boxes.copy(), confidences.copy(), class_ids.copy()
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of detection results per image.
+    แคชผลการตรวจจับสองระดับ (หน่วยความจำและ SQLite)
+
+    Example:
+        cache = ResultCache('cache.sqlite', phash_distance=2)
+        detector = CarDetector('yolov8n.pt', cache=cache)
+        detector.detect_cars_in_images(paths)
+        cache.print_stats()
+    """
+
+    def __init__(self, path=None, max_entries=4096, max_disk_entries=1000000,
+                 phash_distance=None):
+        """
+        Args:
+            path (str): SQLite file for the disk tier (optional)
+            max_entries (int): Entries kept in memory
+            max_disk_entries (int): Rows kept on disk before the least
+                recently used are evicted
+            phash_distance (int): Also return results of images whose
+                perceptual hash differs by at most this many bits (0-3);
+                None matches exact copies only. Near matches can return
+                slightly stale boxes when a small vehicle moves, so keep it
+                low
+        """
+        if phash_distance is not None and not 0 <= phash_distance <= MAX_PHASH_DISTANCE:
+            raise ValueError(f"phash_distance must be between 0 and {MAX_PHASH_DISTANCE}")
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.phash_distance = phash_distance
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        # (namespace, band number, band value) -> memory keys, for near matches
+        # ดัชนีของส่วนค่าแฮช ใช้ค้นหารูปภาพที่เกือบซ้ำในหน่วยความจำ
+        self._band_index = {}
+        self._lock = threading.Lock()
+        self._db = None
+        # Disk writes waiting for the next flush / การเขียนที่รอบันทึกลงดิสก์
+        self._pending_rows = {}
+        self._pending_touches = {}
+        self._last_flush = time.monotonic()
+        self._stored_since_check = 0
+        if path is not None:
+            self._open()
+
+    def _open(self):
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA mmap_size=268435456;
+            CREATE TABLE IF NOT EXISTS results (
+                namespace TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                phash INTEGER,
+                b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER,
+                payload BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, digest)
+            );
+            CREATE INDEX IF NOT EXISTS results_b0 ON results (namespace, b0);
+            CREATE INDEX IF NOT EXISTS results_b1 ON results (namespace, b1);
+            CREATE INDEX IF NOT EXISTS results_b2 ON results (namespace, b2);
+            CREATE INDEX IF NOT EXISTS results_b3 ON results (namespace, b3);
+            CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+        """)
+
+    def __getstate__(self):
+        # Worker processes reopen the SQLite file with an empty memory tier
+        # โปรเซสลูกเปิดไฟล์ SQLite ใหม่ และเริ่มด้วยแคชในหน่วยความจำว่าง
+        return {
+            'path': self.path, 'max_entries': self.max_entries,
+            'max_disk_entries': self.max_disk_entries,
+            'phash_distance': self.phash_distance,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def lookup(self, image, namespace):
+        """
+        Find stored detections for an image.
+        ค้นหาผลการตรวจจับที่บันทึกไว้ของรูปภาพ
+
+        Args:
+            image (np.ndarray): Decoded BGR image
+            namespace (str): Detector settings the result depends on
+
+        Returns:
+            tuple: (result, key) where result is (boxes, confidences,
+                class_ids) or None on a miss, and key is passed to store()
+        """
+        digest = image_digest(image)
+        # None when near matching is off, stored as NULL so later runs with
+        # near matching never compare against it
+        # เก็บเป็น NULL เมื่อไม่ได้คำนวณค่าแฮช เพื่อไม่ให้ถูกจับคู่แบบใกล้เคียง
+        phash = perceptual_hash(image) if self.phash_distance is not None else None
+        key = (namespace, digest, phash)
+        with self._lock:
+            payload = self._memory.get((namespace, digest))
+            if payload is not None:
+                self._memory.move_to_end((namespace, digest))
+                self.hits += 1
+                return _unpack(payload[1]), key
+            near = False
+            payload = self._disk_get(namespace, digest)
+            if payload is None and self.phash_distance is not None:
+                payload = self._near_get(namespace, phash)
+                near = payload is not None
+            if payload is None:
+                self.misses += 1
+                return None, key
+            if near:
+                self.near_hits += 1
+            else:
+                self.hits += 1
+            self._remember((namespace, digest), phash, payload)
+            return _unpack(payload), key
+
+    def store(self, key, boxes, confidences, class_ids):
+        """Save the detections of the image a lookup() missed."""
+        namespace, digest, phash = key
+        payload = _pack(np.asarray(boxes), np.asarray(confidences), np.asarray(class_ids))
+        with self._lock:
+            self._remember((namespace, digest), phash, payload)
+            if self._db is not None:
+                self._pending_rows[(namespace, digest)] = (
+                    namespace, digest, _to_sqlite_int(phash), *_bands(phash),
+                    payload, time.time()
+                )
+                self._pending_touches.pop((namespace, digest), None)
+                self._maybe_flush()
+
+    def _remember(self, memory_key, phash, payload):
+        old = self._memory.get(memory_key)
+        if old is not None:
+            self._index(memory_key, old[0], add=False)
+        self._memory[memory_key] = (phash, payload)
+        self._memory.move_to_end(memory_key)
+        self._index(memory_key, phash)
+        while len(self._memory) > self.max_entries:
+            evicted_key, (evicted_phash, _) = self._memory.popitem(last=False)
+            self._index(evicted_key, evicted_phash, add=False)
+
+    def _index(self, memory_key, phash, add=True):
+        """Add a memory entry to the band index, or remove it."""
+        if phash is None:
+            return
+        for band_no, band in enumerate(_bands(phash)):
+            index_key = (memory_key[0], band_no, band)
+            if add:
+                self._band_index.setdefault(index_key, set()).add(memory_key)
+            else:
+                keys = self._band_index.get(index_key)
+                if keys is not None:
+                    keys.discard(memory_key)
+                    if not keys:
+                        del self._band_index[index_key]
+
+    def _disk_get(self, namespace, digest):
+        if self._db is None:
+            return None
+        pending = self._pending_rows.get((namespace, digest))
+        if pending is not None:
+            return pending[-2]
+        row = self._db.execute(
+            "SELECT payload FROM results WHERE namespace = ? AND digest = ?",
+            (namespace, digest)
+        ).fetchone()
+        if row is None:
+            return None
+        self._touch(namespace, digest)
+        return row[0]
+
+    def _near_get(self, namespace, phash):
+        """Closest stored result within phash_distance bits, memory first."""
+        best, best_distance = None, self.phash_distance + 1
+        bands = _bands(phash)
+        candidates = set()
+        for band_no, band in enumerate(bands):
+            candidates.update(self._band_index.get((namespace, band_no, band), ()))
+        for memory_key in candidates:
+            entry_phash, payload = self._memory[memory_key]
+            distance = _hamming(phash, entry_phash)
+            if distance < best_distance:
+                best, best_distance = payload, distance
+        if best is not None or self._db is None:
+            return best
+        rows = self._db.execute(
+            "SELECT digest, phash, payload FROM results WHERE namespace = ? AND "
+            "phash IS NOT NULL AND (b0 = ? OR b1 = ? OR b2 = ? OR b3 = ?)",
+            (namespace, *bands)
+        ).fetchall()
+        best_digest = None
+        for digest, stored, payload in rows:
+            distance = _hamming(phash, stored & 0xFFFFFFFFFFFFFFFF)
+            if distance < best_distance:
+                best, best_distance, best_digest = payload, distance, digest
+        if best_digest is not None:
+            self._touch(namespace, best_digest)
+        return best
+
+    def _touch(self, namespace, digest):
+        self._pending_touches[(namespace, digest)] = time.time()
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending = len(self._pending_rows) + len(self._pending_touches)
+        if (pending >= FLUSH_EVERY or
+                time.monotonic() - self._last_flush >= FLUSH_SECONDS):
+            self._flush()
+
+    def _flush(self):
+        """Write buffered rows and last-used times in one transaction."""
+        self._last_flush = time.monotonic()
+        if self._db is None or not (self._pending_rows or self._pending_touches):
+            return
+        rows, self._pending_rows = list(self._pending_rows.values()), {}
+        touches, self._pending_touches = self._pending_touches, {}
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._db.executemany(
+                "UPDATE results SET last_used = ? WHERE namespace = ? AND digest = ?",
+                [(used, namespace, digest) for (namespace, digest), used in touches.items()]
+            )
+        self._stored_since_check += len(rows)
+        if self._stored_since_check >= EVICT_CHECK_EVERY:
+            self._stored_since_check = 0
+            self._evict_disk()
+
+    def flush(self):
+        """Write buffered results to the SQLite file now."""
+        with self._lock:
+            self._flush()
+
+    def _evict_disk(self):
+        """Drop the least recently used tenth once the table is over its limit."""
+        count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count <= self.max_disk_entries:
+            return
+        excess = count - self.max_disk_entries + self.max_disk_entries // 10
+        self._db.execute(
+            "DELETE FROM results WHERE rowid IN "
+            "(SELECT rowid FROM results ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._db.commit()
+
+    def stats(self):
+        """
+        Hit counts and hit rate as a dict.
+        สถิติการใช้แคช
+        """
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            stats = {
+                'lookups': lookups,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+            }
+            if self._db is not None:
+                self._flush()
+                stats['disk_entries'] = self._db.execute(
+                    "SELECT COUNT(*) FROM results"
+                ).fetchone()[0]
+            return stats
+
+    def print_stats(self):
+        """Print a one-line cache summary."""
+        stats = self.stats()
+        line = (
+            f"Result cache: {stats['hits']} hit(s), {stats['near_hits']} near hit(s), "
+            f"{stats['misses']} miss(es), hit rate {stats['hit_rate']:.1%}"
+        )
+        if 'disk_entries' in stats:
+            line += f", {stats['disk_entries']} entries on disk"
+        print(line)
+
+    def close(self):
+        """Write buffered results and close the SQLite file."""
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
@@ -0,0 +1,149 @@
+"""
+Regions of interest for fixed cameras
+พื้นที่ที่สนใจสำหรับกล้องที่ติดตั้งอยู่กับที่
+
+Most traffic cameras only need to watch a few lanes. A RegionOfInterest
+holds one or more polygons (or a mask image); frames are cropped to the
+polygons' bounding rectangle before inference, boxes are shifted back to
+full-frame coordinates, and vehicles whose anchor point (bottom centre of
+the box by default) lies outside every polygon are dropped.
+
+ROI files:
+  * JSON: {"polygons": [[[x, y], [x, y], ...], ...]} in pixels
+  * Image (.png, .jpg, ...): non-zero pixels are inside the region
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class RegionOfInterest:
+    """
+    Crop frames to the lanes of interest and drop detections outside them.
+    ตัดเฟรมให้เหลือเฉพาะช่องทางที่สนใจและตัดการตรวจจับที่อยู่นอกพื้นที่
+
+    Example:
+        roi = RegionOfInterest([[(100, 400), (900, 400), (1200, 720), (0, 720)]])
+        detector.detect_cars_in_video('cam1.mp4', roi=roi)
+    """
+
+    def __init__(self, polygons=None, mask=None, anchor='bottom'):
+        """
+        Args:
+            polygons (list): Polygons as lists of (x, y) pixel points
+            mask (np.ndarray): Single-channel mask, non-zero inside the
+                region (alternative to polygons)
+            anchor (str): Point of a box that must be inside the region:
+                'bottom' (bottom centre, where the vehicle meets the road)
+                or 'center'
+        """
+        if (polygons is None) == (mask is None):
+            raise ValueError("Give either polygons or a mask")
+        if anchor not in ('bottom', 'center'):
+            raise ValueError(f"Unknown anchor: {anchor}")
+        self.anchor = anchor
+        self.polygons = None
+        self._mask = None
+        self._masks = {}
+        if polygons is not None:
+            self.polygons = [np.asarray(p, dtype=np.int32).reshape(-1, 2) for p in polygons]
+            if not self.polygons or any(len(p) < 3 for p in self.polygons):
+                raise ValueError("Each ROI polygon needs at least 3 points")
+            points = np.concatenate(self.polygons)
+        else:
+            self._mask = np.asarray(mask) > 0
+            ys, xs = np.nonzero(self._mask)
+            if not len(xs):
+                raise ValueError("ROI mask is empty")
+            points = np.stack([xs, ys], axis=1)
+        x1, y1 = points.min(axis=0)
+        x2, y2 = points.max(axis=0) + 1
+        self.rect = (max(int(x1), 0), max(int(y1), 0), int(x2), int(y2))
+
+        # Identifies the region in result cache keys / ใช้ระบุพื้นที่ในคีย์ของแคช
+        digest = hashlib.blake2b(anchor.encode(), digest_size=8)
+        for part in (self.polygons or [self._mask]):
+            digest.update(np.ascontiguousarray(part).data)
+        self.fingerprint = digest.hexdigest()
+
+    @classmethod
+    def from_file(cls, path, anchor='bottom'):
+        """
+        Load an ROI from a JSON polygon file or a mask image.
+        โหลดพื้นที่ที่สนใจจากไฟล์ JSON หรือรูปภาพมาสก์
+        """
+        path = Path(path)
+        if path.suffix.lower() == '.json':
+            with open(path, 'r') as f:
+                data = json.load(f)
+            polygons = data['polygons'] if isinstance(data, dict) else data
+            return cls(polygons=polygons, anchor=anchor)
+        mask = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            raise ValueError(f"Cannot read ROI mask from {path}")
+        return cls(mask=mask, anchor=anchor)
+
+    def _mask_for(self, height, width):
+        """Full-frame boolean mask, rasterized once per frame size."""
+        mask = self._masks.get((height, width))
+        if mask is None:
+            if self._mask is not None:
+                if self._mask.shape != (height, width):
+                    raise ValueError(
+                        f"ROI mask is {self._mask.shape[1]}x{self._mask.shape[0]}, "
+                        f"frame is {width}x{height}"
+                    )
+                mask = self._mask
+            else:
+                canvas = np.zeros((height, width), dtype=np.uint8)
+                cv2.fillPoly(canvas, self.polygons, 1)
+                mask = canvas.astype(bool)
+            self._masks[(height, width)] = mask
+        return mask
+
+    def crop(self, frame):
+        """Return a view of the frame limited to the ROI bounding rectangle."""
+        x1, y1, x2, y2 = self.rect
+        return frame[y1:y2, x1:x2]
+
+    def restore(self, detections, frame_shape):
+        """
+        Map detections from a cropped frame back to the full frame and drop
+        the ones whose anchor point is outside the region.
+        แปลงพิกัดกลับเป็นของเฟรมเต็มและตัดการตรวจจับที่อยู่นอกพื้นที่
+
+        Args:
+            detections (Detections): Detections on the cropped frame
+            frame_shape (tuple): Shape of the full frame
+
+        Returns:
+            Detections: Detections inside the region, in full-frame pixels
+        """
+        x1, y1 = self.rect[:2]
+        detections.boxes += np.array([x1, y1, x1, y1], dtype=detections.boxes.dtype)
+        if not len(detections):
+            return detections
+
+        height, width = frame_shape[:2]
+        boxes = detections.boxes
+        xs = (boxes[:, 0] + boxes[:, 2]) // 2
+        ys = boxes[:, 3] - 1 if self.anchor == 'bottom' else (boxes[:, 1] + boxes[:, 3]) // 2
+        inside = self._mask_for(height, width)[
+            np.clip(ys, 0, height - 1), np.clip(xs, 0, width - 1)
+        ]
+        return detections if inside.all() else detections[inside]
+
+    def draw(self, frame, color=(255, 200, 0)):
+        """Outline the region on a frame in place."""
+        if self.polygons is not None:
+            cv2.polylines(frame, self.polygons, True, color, 2)
+        else:
+            x1, y1, x2, y2 = self.rect
+            cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), color, 2)
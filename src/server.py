@@ -0,0 +1,492 @@
+"""
+Detection server with a local HTTP / Unix-socket API
+เซิร์ฟเวอร์ตรวจจับรถยนต์ผ่าน HTTP และ Unix socket
+
+Keeps one warm CarDetector in memory and shares it between clients, so no
+request pays for loading the model. Requests arriving close together are
+grouped into one model call (micro-batching): a batch is sent when it
+reaches --max-batch images or when its oldest image has waited
+--max-wait-ms. At most --max-pending requests are accepted at once; more
+are answered with 503 so clients can back off. A request not answered
+within --request-timeout gets 504 and, if still queued, never reaches the
+model.
+
+Endpoints:
+  POST /detect    Body: an encoded image (JPEG, PNG, ...), or raw BGR
+                  pixels with ?width=W&height=H. Returns JSON detections.
+  GET  /health    Backend and queue state as JSON
+  GET  /metrics   Prometheus text-format metrics
+
+Usage:
+    python src/car_detector.py serve --model yolov8n.pt --port 8080 \\
+        --socket /tmp/car_detector.sock
+    curl --data-binary @car.jpg http://127.0.0.1:8080/detect
+    curl --unix-socket /tmp/car_detector.sock --data-binary @car.jpg http://localhost/detect
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import argparse
+import json
+import os
+import queue
+import signal
+import socketserver
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+
+class ServerBusy(Exception):
+    """Raised when the server already holds --max-pending requests."""
+
+
+class RequestTimeout(Exception):
+    """Raised when a request is not answered within --request-timeout."""
+
+
+class MicroBatcher:
+    """
+    Group concurrent requests into batched model calls on one thread.
+    รวมคำขอที่เข้ามาพร้อมกันเป็นแบตช์ แล้วประมวลผลบนเธรดเดียว
+
+    Only the batching thread touches the model, so the detector does not
+    need to be thread-safe.
+    """
+
+    def __init__(self, detector, max_batch=8, max_wait_ms=5.0, max_pending=64):
+        """
+        Args:
+            detector (CarDetector): Loaded detector
+            max_batch (int): Most images per model call
+            max_wait_ms (float): Longest time the first image of a batch
+                waits for more images
+            max_pending (int): Most requests queued or running at once
+        """
+        if max_batch < 1 or max_pending < 1:
+            raise ValueError("max_batch and max_pending must be at least 1")
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.batches = 0
+        self.images = 0
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """Requests accepted and not yet answered or dropped by the batcher."""
+        with self._lock:
+            return self._pending
+
+    def _finished(self, count):
+        with self._lock:
+            self._pending -= count
+
+    def detect(self, image, timeout=None):
+        """
+        Queue one image and wait for its detections.
+        ส่งรูปภาพเข้าคิวและรอผลการตรวจจับ
+
+        Raises:
+            ServerBusy: When max_pending requests are already in progress,
+                or the batcher is closing
+            RequestTimeout: When no result arrived within `timeout` seconds;
+                a request still queued is cancelled and never reaches the
+                model
+        """
+        # The request counts as pending until the batching thread answers or
+        # drops it, so timed-out requests still queued stay within max_pending
+        # คำขอนับว่าค้างอยู่จนกว่าเธรดรวมแบตช์จะตอบหรือทิ้ง
+        future = Future()
+        with self._lock:
+            if self._stop.is_set():
+                raise ServerBusy("Server is shutting down")
+            busy = self._pending >= self.max_pending
+            if not busy:
+                self._pending += 1
+                self._queue.put((image, time.perf_counter(), future))
+        if busy:
+            if self.detector.metrics is not None:
+                self.detector.metrics.frame_dropped()
+            raise ServerBusy(f"{self.max_pending} requests already pending")
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # Cancelling fails once the batch is running; the result is dropped
+            # ยกเลิกไม่ได้หากอยู่ในแบตช์ที่กำลังประมวลผล ผลลัพธ์จะถูกทิ้ง
+            future.cancel()
+            raise RequestTimeout(f"No result within {timeout} s") from None
+
+    def _next_batch(self):
+        """
+        Block for the first request, then gather more until the batch is
+        full or the first one has waited max_wait. Returns [] once closed.
+        """
+        batch = []
+        while not batch:
+            if self._stop.is_set():
+                return []
+            try:
+                batch.append(self._queue.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        deadline = batch[0][1] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        metrics = self.detector.metrics
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            # Drop requests cancelled after a timeout; the rest can no longer
+            # be cancelled / ทิ้งคำขอที่ถูกยกเลิกเพราะหมดเวลา
+            gathered = len(batch)
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            self._finished(gathered - len(batch))
+            if not batch:
+                continue
+            start = time.perf_counter()
+            images = [image for image, _, _ in batch]
+            stages = [{'queue_wait': (start - queued) * 1000} for _, queued, _ in batch]
+            try:
+                results = self.detector.detect_frames(images, stages)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                self._finished(len(batch))
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            if metrics is not None:
+                metrics.set_queue_depth('requests', self._queue.qsize())
+            for (_, _, future), detections, frame_stages in zip(batch, results, stages):
+                self.detector._record_frame(frame_stages, detections, source='server')
+                future.set_result(detections)
+            self._finished(len(batch))
+
+    def close(self):
+        """
+        Stop the batching thread after its current batch, and answer the
+        requests still queued with ServerBusy.
+        """
+        with self._lock:
+            self._stop.set()
+        self._thread.join()
+        # Nothing reads the queue any more / ไม่มีเธรดใดอ่านคิวแล้ว
+        with self._lock:
+            while True:
+                try:
+                    _, _, future = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(ServerBusy("Server is shutting down"))
+                self._pending -= 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP request handler; self.server.app is the DetectionServer."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body) + '\n').encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, {'error': message})
+
+    def do_GET(self):
+        app = self.server.app
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send(200, app.health())
+        elif path == '/metrics':
+            self._send(200, app.metrics.to_prometheus().encode('utf-8'),
+                       'text/plain; version=0.0.4')
+        else:
+            self._error(404, f"Unknown path: {path}")
+
+    def do_POST(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        if url.path != '/detect':
+            self._error(404, f"Unknown path: {url.path}")
+            return
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            self._error(400, "Content-Length must be an integer")
+            # The body cannot be skipped without its length / ข้ามเนื้อหาไม่ได้
+            self.close_connection = True
+            return
+        if length <= 0:
+            self._error(411, "Send the image in the request body with a Content-Length")
+            return
+        if length > app.max_body_bytes:
+            self._error(413, f"Body larger than {app.max_body_bytes} bytes")
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+
+        try:
+            image = _decode_image(body, parse_qs(url.query))
+            detections = app.batcher.detect(image, timeout=app.request_timeout)
+        except ServerBusy as e:
+            self._error(503, str(e))
+            return
+        except RequestTimeout as e:
+            self._error(504, str(e))
+            return
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        except Exception as e:
+            self._error(500, str(e))
+            return
+        self._send(200, {
+            'count': len(detections),
+            'detections': detections.to_dicts(),
+            'time_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    def address_string(self):
+        # Unix-socket clients have no (host, port) address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.app.verbose:
+            super().log_message(format, *args)
+
+
+def _decode_image(body, query):
+    """
+    Turn a request body into a BGR image.
+    แปลงข้อมูลในคำขอเป็นรูปภาพ BGR
+
+    With width and height query parameters the body is raw BGR pixels
+    (height * width * 3 bytes); otherwise it is an encoded image file.
+    """
+    if 'width' in query or 'height' in query:
+        try:
+            width, height = int(query['width'][0]), int(query['height'][0])
+        except (KeyError, ValueError):
+            raise ValueError("Raw images need integer width and height parameters") from None
+        if width <= 0 or height <= 0 or len(body) != width * height * 3:
+            raise ValueError(f"Raw BGR body must be {width}x{height}x3 bytes, got {len(body)}")
+        return np.frombuffer(body, dtype=np.uint8).reshape(height, width, 3)
+    image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Cannot decode the image in the request body")
+    return image
+
+
+# Windows has no Unix domain socket server / Windows ไม่มีเซิร์ฟเวอร์ Unix socket
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """HTTP over a Unix domain socket, one thread per connection."""
+
+        daemon_threads = True
+else:
+    _UnixHTTPServer = None
+
+
+class DetectionServer:
+    """
+    Serve one CarDetector over HTTP and/or a Unix domain socket.
+    ให้บริการ CarDetector ผ่าน HTTP และ/หรือ Unix domain socket
+
+    Example:
+        detector = CarDetector('yolov8n.pt', metrics=Metrics(), warmup=True)
+        server = DetectionServer(detector, port=8080, socket_path='/tmp/cars.sock')
+        server.serve_forever()
+    """
+
+    def __init__(self, detector, host='127.0.0.1', port=8080, socket_path=None,
+                 max_batch=8, max_wait_ms=5.0, max_pending=64,
+                 max_body_mb=32, request_timeout=30.0, verbose=False):
+        """
+        Args:
+            detector (CarDetector): Loaded detector; a Metrics object is
+                attached if it has none
+            host (str): HTTP address to bind
+            port (int): HTTP port, or None for no HTTP listener
+            socket_path (str): Unix socket path, or None for no socket
+            max_batch (int): Most images per model call
+            max_wait_ms (float): Longest wait for a batch to fill
+            max_pending (int): Most requests in progress at once
+            max_body_mb (float): Largest accepted request body
+            request_timeout (float): Seconds a request waits for its result
+            verbose (bool): Log every request to stderr
+        """
+        if port is None and socket_path is None:
+            raise ValueError("Give a port, a socket path or both")
+        if socket_path is not None and _UnixHTTPServer is None:
+            raise ValueError("Unix sockets are not available on this platform")
+        if detector.metrics is None:
+            from metrics import Metrics
+            detector.metrics = Metrics()
+        self.detector = detector
+        self.metrics = detector.metrics
+        self.max_body_bytes = int(max_body_mb * 1024 * 1024)
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        self.started = time.time()
+        self.batcher = MicroBatcher(detector, max_batch, max_wait_ms, max_pending)
+
+        self._servers = []
+        if port is not None:
+            http_server = ThreadingHTTPServer((host, port), _Handler)
+            http_server.daemon_threads = True
+            self._servers.append(http_server)
+            self.address = http_server.server_address
+        self.socket_path = socket_path
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                # Remove a socket left by a previous run / ลบ socket เก่าที่ค้างอยู่
+                os.unlink(socket_path)
+            self._servers.append(_UnixHTTPServer(socket_path, _Handler))
+        for server in self._servers:
+            server.app = self
+
+    def health(self):
+        """Server state for GET /health."""
+        return {
+            'status': 'ok',
+            'backend': self.detector.backend.name,
+            'uptime_s': round(time.time() - self.started, 1),
+            'pending': self.batcher.pending,
+            'max_pending': self.batcher.max_pending,
+            'max_batch': self.batcher.max_batch,
+            'batches': self.batcher.batches,
+            'images': self.batcher.images,
+        }
+
+    def serve_forever(self):
+        """Serve until shutdown() is called or SIGINT/SIGTERM arrives."""
+        threads = [
+            threading.Thread(target=server.serve_forever, daemon=True)
+            for server in self._servers
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop listening, finish the batcher and remove the socket file."""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        self.batcher.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def main(argv=None):
+    """Command line entry point for the detection server."""
+    from car_detector import CarDetector
+    from metrics import Metrics
+
+    parser = argparse.ArgumentParser(
+        prog='car_detector.py serve',
+        description='Serve car detection over HTTP / Unix socket / ให้บริการตรวจจับรถยนต์'
+    )
+    parser.add_argument('--model', '-m', type=str, default='yolov8n.pt',
+                        help='YOLOv8 model or exported/quantized model file')
+    parser.add_argument('--backend', type=str, default='auto',
+                        help='Inference engine: auto, torch, onnx, openvino or torchscript')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for inference')
+    parser.add_argument('--imgsz', type=int, default=640, help='Model input size')
+    parser.add_argument('--conf', '-c', type=float, default=0.5, help='Confidence threshold')
+    parser.add_argument('--max-det', type=int, default=300, help='Maximum vehicles per image')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='HTTP address to bind')
+    parser.add_argument('--port', type=int, default=8080, help='HTTP port (0 picks a free port)')
+    parser.add_argument('--no-http', action='store_true', help='Only listen on --socket')
+    parser.add_argument('--socket', type=str, default=None, help='Also listen on this Unix socket')
+    parser.add_argument('--max-batch', type=int, default=8, help='Most images per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Longest time a request waits for its batch to fill')
+    parser.add_argument('--max-pending', type=int, default=64,
+                        help='Most requests in progress; more get HTTP 503')
+    parser.add_argument('--max-body-mb', type=float, default=32, help='Largest request body')
+    parser.add_argument('--request-timeout', type=float, default=30.0,
+                        help='Seconds a request may wait for its result before HTTP 504')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args(argv)
+
+    try:
+        detector = CarDetector(
+            model_name=args.model, conf_threshold=args.conf, metrics=Metrics(),
+            backend=args.backend, threads=args.threads, imgsz=args.imgsz,
+            max_det=args.max_det
+        )
+        # Warm up for every batch size a request burst can produce
+        # อุ่นเครื่องสำหรับทุกขนาดแบตช์ที่อาจเกิดขึ้น
+        for batch_size in sorted({1, args.max_batch}):
+            detector.warmup(batch_size=batch_size)
+        server = DetectionServer(
+            detector, host=args.host, port=None if args.no_http else args.port,
+            socket_path=args.socket, max_batch=args.max_batch,
+            max_wait_ms=args.max_wait_ms, max_pending=args.max_pending,
+            max_body_mb=args.max_body_mb, request_timeout=args.request_timeout,
+            verbose=args.verbose
+        )
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Treat SIGTERM like Ctrl+C so the socket file is removed
+    # จัดการ SIGTERM เหมือน Ctrl+C เพื่อให้ลบไฟล์ socket
+    signal.signal(signal.SIGTERM, stop)
+    if not args.no_http:
+        host, port = server.address[:2]
+        print(f"Listening on http://{host}:{port}")
+    if args.socket:
+        print(f"Listening on unix:{args.socket}")
+    print("Press Ctrl+C to stop")
+    server.serve_forever()
+    print("Server stopped")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
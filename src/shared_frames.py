@@ -0,0 +1,294 @@
+"""
+Shared-memory frame transport between decoder processes and inference
+การส่งเฟรมผ่านหน่วยความจำร่วมระหว่างโปรเซสถอดรหัสและการตรวจจับ
+
+Sending a decoded frame to another process normally pickles and copies it,
+about 6 MB per full-HD frame and 25 MB per 4K frame. SharedFrameRing
+preallocates frame slots in one multiprocessing.shared_memory block
+instead: a decoder process writes a frame into a free slot (video frames
+are decoded straight into it) and sends only the slot number; the
+inference side wraps the slot in a NumPy array without copying, and hands
+the slot back when it is done with the frame.
+
+Slots are split into lanes, one per decoder process, each with its own
+free and ready queues. Reading the lanes in turn keeps frames in input
+order, and a slow decoder can never be starved of slots by a fast one.
+
+Frames larger than a slot are still sent, pickled through the queue.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+class SharedFrameRing:
+    """
+    Fixed frame slots in shared memory, handed between processes by number.
+    ช่องเก็บเฟรมในหน่วยความจำร่วม ส่งต่อระหว่างโปรเซสด้วยหมายเลขช่อง
+
+    Create the ring in the consuming process and pass it to decoder
+    processes as a Process argument. Producer side: acquire() / slot_view()
+    / publish(), or put(); end() when done. Consumer side: get() and
+    release(). Call close() in the creating process to free the memory.
+    """
+
+    def __init__(self, slots_per_lane, slot_bytes, lanes=1, context=None):
+        """
+        Args:
+            slots_per_lane (int): Frames each lane can hold at once
+            slot_bytes (int): Size of one slot, e.g. width * height * 3
+            lanes (int): Number of decoder processes feeding the ring
+            context: multiprocessing context (default: spawn)
+        """
+        if slots_per_lane < 1 or lanes < 1 or slot_bytes < 1:
+            raise ValueError("slots_per_lane, lanes and slot_bytes must be at least 1")
+        context = context or multiprocessing.get_context('spawn')
+        self.slots_per_lane = slots_per_lane
+        self.slot_bytes = slot_bytes
+        self.lanes = lanes
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=slots_per_lane * lanes * slot_bytes
+        )
+        self._owner = True
+        self._free = [context.Queue() for _ in range(lanes)]
+        self._ready = [context.Queue() for _ in range(lanes)]
+        for lane in range(lanes):
+            for slot in range(lane * slots_per_lane, (lane + 1) * slots_per_lane):
+                self._free[lane].put(slot)
+
+    def __getstate__(self):
+        # Decoder processes attach to the same block by name
+        # โปรเซสลูกเชื่อมต่อกับหน่วยความจำเดิมด้วยชื่อ
+        return {
+            'name': self._shm.name, 'slots_per_lane': self.slots_per_lane,
+            'slot_bytes': self.slot_bytes, 'lanes': self.lanes,
+            'free': self._free, 'ready': self._ready,
+        }
+
+    def __setstate__(self, state):
+        self.slots_per_lane = state['slots_per_lane']
+        self.slot_bytes = state['slot_bytes']
+        self.lanes = state['lanes']
+        self._free = state['free']
+        self._ready = state['ready']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+
+    def slot_view(self, slot, shape):
+        """NumPy uint8 array of the given shape over a slot (no copy)."""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf,
+                          offset=slot * self.slot_bytes)
+
+    def acquire(self, lane=0, timeout=None):
+        """Wait for a free slot of a lane; raises queue.Empty on timeout."""
+        return self._free[lane].get(timeout=timeout)
+
+    def publish(self, slot, shape, meta=None, lane=0):
+        """Hand a filled slot to the consumer together with `meta`."""
+        self._ready[lane].put((slot, tuple(shape), meta))
+
+    def put(self, frame, meta=None, lane=0):
+        """Copy a frame into a free slot and publish it; None sends no frame."""
+        if frame is None or frame.nbytes > self.slot_bytes or frame.dtype != np.uint8:
+            # Does not fit: send it through the queue / ใหญ่เกินช่อง จึงส่งผ่านคิว
+            self._ready[lane].put((None, frame, meta))
+            return
+        slot = self.acquire(lane)
+        self.slot_view(slot, frame.shape)[...] = frame
+        self.publish(slot, frame.shape, meta, lane)
+
+    def end(self, lane=0):
+        """Tell the consumer that a lane has no more frames."""
+        self._ready[lane].put(None)
+
+    def get(self, lane=0, timeout=None):
+        """
+        Wait for the next frame of a lane.
+        รอเฟรมถัดไปของช่องทางนี้
+
+        Returns:
+            tuple: (slot, frame, meta), or None once the lane has ended.
+                frame lives in shared memory until release(slot); slot is
+                None for frames sent through the queue
+        """
+        item = self._ready[lane].get(timeout=timeout)
+        if item is None:
+            return None
+        slot, shape, meta = item
+        if slot is None:
+            return None, shape, meta
+        return slot, self.slot_view(slot, shape), meta
+
+    def release(self, slot):
+        """Give a slot back to its lane once the frame is no longer used."""
+        if slot is not None:
+            self._free[slot // self.slots_per_lane].put(slot)
+
+    def close(self):
+        """Detach from the shared memory; the creator also frees it."""
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _acquire_until(ring, lane, stop):
+    """Wait for a free slot, giving up once stop is set."""
+    while not stop.is_set():
+        try:
+            return ring.acquire(lane, timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+
+def decode_video(ring, video_path, stop):
+    """
+    Decoder process: read a video straight into ring slots.
+    โปรเซสถอดรหัส: อ่านวิดีโอลงในช่องของหน่วยความจำร่วมโดยตรง
+
+    Each slot is passed to cv2.VideoCapture.read() as the output array, so
+    the frame is decoded into shared memory without another copy. meta is
+    the decode time in milliseconds.
+    """
+    if isinstance(video_path, int) or str(video_path).isdigit():
+        cap = cv2.VideoCapture(int(video_path))
+    else:
+        cap = cv2.VideoCapture(str(video_path))
+    shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    try:
+        while cap.isOpened():
+            slot = _acquire_until(ring, 0, stop)
+            if slot is None:
+                break
+            start = time.perf_counter()
+            view = ring.slot_view(slot, shape)
+            ret, frame = cap.read(view)
+            decode_ms = (time.perf_counter() - start) * 1000
+            if not ret:
+                ring.release(slot)
+                break
+            if frame is view or np.shares_memory(frame, view):
+                ring.publish(slot, shape, decode_ms)
+            else:
+                # OpenCV allocated its own frame (size unknown or changed);
+                # decode later frames of this size into the slots again
+                # OpenCV สร้างเฟรมใหม่เอง (ไม่ทราบขนาดหรือขนาดเปลี่ยน)
+                ring.release(slot)
+                ring.put(frame, decode_ms)
+                if frame.nbytes <= ring.slot_bytes:
+                    shape = frame.shape
+    finally:
+        cap.release()
+        ring.end()
+
+
+def decode_images(ring, image_paths, lane, stop):
+    """
+    Decoder process: read every `ring.lanes`-th image into one lane.
+    โปรเซสถอดรหัส: อ่านรูปภาพที่ได้รับมอบหมายลงในช่องทางของตน
+
+    meta is (image_path, decode_ms); unreadable images are sent as None.
+    """
+    try:
+        for image_path in image_paths[lane::ring.lanes]:
+            if stop.is_set():
+                break
+            start = time.perf_counter()
+            image = cv2.imread(str(image_path))
+            decode_ms = (time.perf_counter() - start) * 1000
+            if image is not None and image.nbytes <= ring.slot_bytes:
+                slot = _acquire_until(ring, lane, stop)
+                if slot is None:
+                    break
+                ring.slot_view(slot, image.shape)[...] = image
+                ring.publish(slot, image.shape, (image_path, decode_ms), lane)
+            else:
+                ring.put(image, (image_path, decode_ms), lane)
+    finally:
+        ring.end(lane)
+
+
+class SharedDecoders:
+    """
+    Start decoder processes feeding a SharedFrameRing and stop them again.
+    เริ่มและหยุดโปรเซสถอดรหัสที่ส่งเฟรมผ่าน SharedFrameRing
+    """
+
+    def __init__(self, ring, target, args_per_process):
+        context = multiprocessing.get_context('spawn')
+        self.ring = ring
+        self.stop = context.Event()
+        self.processes = [
+            context.Process(target=target, args=(ring,) + tuple(args) + (self.stop,), daemon=True)
+            for args in args_per_process
+        ]
+        for process in self.processes:
+            process.start()
+
+    def _get(self, lane, poll=0.5):
+        """
+        Wait for the next item of a lane, checking that its decoder is alive.
+        Lane i is fed by process i.
+        """
+        process = self.processes[lane]
+        while True:
+            try:
+                return self.ring.get(lane, timeout=poll)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+            # The decoder has exited; anything it sent is in the queue by now
+            # โปรเซสถอดรหัสจบแล้ว ข้อมูลที่ส่งมาต้องอยู่ในคิวแล้ว
+            try:
+                return self.ring.get(lane, timeout=poll)
+            except queue.Empty:
+                raise RuntimeError(
+                    f"Decoder process {process.pid} exited early "
+                    f"with code {process.exitcode}"
+                ) from None
+
+    def frames(self):
+        """
+        Yield (slot, frame, meta) from the lanes in turn until all end.
+        The caller must release(slot) once done with each frame.
+
+        Raises:
+            RuntimeError: When a decoder process exits without ending its lane
+        """
+        lane = 0
+        open_lanes = set(range(self.ring.lanes))
+        while open_lanes:
+            if lane in open_lanes:
+                item = self._get(lane)
+                if item is None:
+                    open_lanes.discard(lane)
+                else:
+                    yield item
+            lane = (lane + 1) % self.ring.lanes
+
+    def close(self):
+        """Stop the decoders and free the shared memory."""
+        self.stop.set()
+        deadline = time.monotonic() + 5
+        for process in self.processes:
+            # A process only exits once its queued items are read, so keep
+            # draining / โปรเซสลูกจะจบได้เมื่อข้อมูลในคิวถูกอ่านออกหมด
+            while process.is_alive() and time.monotonic() < deadline:
+                for lane in range(self.ring.lanes):
+                    try:
+                        while True:
+                            self.ring._ready[lane].get_nowait()
+                    except queue.Empty:
+                        pass
+                process.join(timeout=0.05)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
@@ -0,0 +1,276 @@
+"""
+Streaming detection output for video and batch runs
+การเขียนผลการตรวจจับแบบต่อเนื่องสำหรับวิดีโอและการประมวลผลแบบแบตช์
+
+A sink receives the detections of every processed frame or image and
+writes them as flat rows, one row per vehicle, so results can be loaded
+downstream without decoding the annotated video again. Rows are buffered
+and written `batch_rows` at a time (one Arrow record batch or Parquet row
+group per write), so memory stays bounded however long the run is.
+
+Columns: time, source, frame, video_time, track_id, class_id, class_name,
+confidence, x1, y1, x2, y2. Frames without vehicles produce no rows.
+`time` is the Unix time the frame was captured (live mode) or processed;
+`video_time` is the frame's position in seconds from the start of a video
+file, taken from its frame number and frame rate, so it does not depend on
+when or in which order frames were processed (empty for images and
+cameras).
+
+Formats:
+  * jsonl: one JSON object per row (no extra dependencies)
+  * arrow: Arrow IPC file (needs pyarrow)
+  * parquet: Parquet file (needs pyarrow)
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+
+SINK_FORMATS = ('jsonl', 'arrow', 'parquet')
+
+_SUFFIX_FORMATS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.arrow': 'arrow',
+    '.ipc': 'arrow',
+    '.feather': 'arrow',
+    '.parquet': 'parquet',
+}
+
+COLUMNS = (
+    'time', 'source', 'frame', 'video_time', 'track_id', 'class_id', 'class_name',
+    'confidence', 'x1', 'y1', 'x2', 'y2'
+)
+
+
+class DetectionSink:
+    """
+    Buffer detection rows and write them in batches.
+    เก็บผลการตรวจจับไว้ในบัฟเฟอร์แล้วเขียนเป็นชุด
+
+    Subclasses implement _write_rows(columns), which receives a dict of
+    equal-length column lists. Sinks are thread-safe and can be used as
+    context managers.
+    """
+
+    def __init__(self, path, batch_rows=10000):
+        """
+        Args:
+            path (str): Output file (overwritten)
+            batch_rows (int): Rows buffered before each write
+        """
+        if batch_rows < 1:
+            raise ValueError("batch_rows must be at least 1")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._columns = {name: [] for name in COLUMNS}
+        self._pending = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def write(self, detections, frame=None, source=None, timestamp=None, video_time=None):
+        """
+        Add the detections of one frame or image.
+        เพิ่มผลการตรวจจับของหนึ่งเฟรมหรือหนึ่งรูปภาพ
+
+        Args:
+            detections (Detections): Detections of the frame
+            frame (int): Frame index (optional)
+            source (str): Image path or video source (optional)
+            timestamp (float): Unix time of the frame (default: now)
+            video_time (float): Position of the frame in the video, in
+                seconds (optional)
+        """
+        count = len(detections)
+        if not count:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        source = None if source is None else str(source)
+        names = detections.class_names
+        class_ids = detections.class_ids.tolist()
+        boxes = detections.boxes
+
+        with self._lock:
+            if self._closed:
+                raise ValueError("Sink is closed")
+            columns = self._columns
+            columns['time'].extend([timestamp] * count)
+            columns['source'].extend([source] * count)
+            columns['frame'].extend([frame] * count)
+            columns['video_time'].extend([video_time] * count)
+            columns['track_id'].extend(
+                [None] * count if detections.track_ids is None
+                else detections.track_ids.tolist()
+            )
+            columns['class_id'].extend(class_ids)
+            columns['class_name'].extend(names.get(c) for c in class_ids)
+            columns['confidence'].extend(
+                round(c, 4) for c in detections.confidences.tolist()
+            )
+            for i, name in enumerate(('x1', 'y1', 'x2', 'y2')):
+                columns[name].extend(boxes[:, i].tolist())
+            self._pending += count
+            if self._pending >= self.batch_rows:
+                self._flush()
+
+    def write_records(self, records):
+        """
+        Add rows that are already in column form, e.g. read back from a
+        JSONL file written by another sink.
+        เพิ่มแถวที่อยู่ในรูปแบบคอลัมน์แล้ว
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("Sink is closed")
+            for record in records:
+                for name in COLUMNS:
+                    self._columns[name].append(record.get(name))
+                self._pending += 1
+                if self._pending >= self.batch_rows:
+                    self._flush()
+
+    def _flush(self):
+        """Write buffered rows; the caller holds the lock."""
+        if not self._pending:
+            return
+        self._write_rows(self._columns)
+        self.rows_written += self._pending
+        self._columns = {name: [] for name in COLUMNS}
+        self._pending = 0
+
+    def flush(self):
+        """Write all buffered rows now."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Write what is left and close the file."""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._close()
+            self._closed = True
+
+    def _write_rows(self, columns):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonLinesSink(DetectionSink):
+    """
+    Write one JSON object per detection.
+    เขียน JSON หนึ่งบรรทัดต่อหนึ่งการตรวจจับ
+    """
+
+    def __init__(self, path, batch_rows=10000):
+        super().__init__(path, batch_rows)
+        self._file = open(self.path, 'w')
+
+    def _write_rows(self, columns):
+        lines = [
+            json.dumps(dict(zip(COLUMNS, row)))
+            for row in zip(*(columns[name] for name in COLUMNS))
+        ]
+        self._file.write('\n'.join(lines) + '\n')
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class ArrowSink(DetectionSink):
+    """
+    Write detections to an Arrow IPC or Parquet file with pyarrow.
+    เขียนผลการตรวจจับเป็นไฟล์ Arrow IPC หรือ Parquet ด้วย pyarrow
+
+    Each flush becomes one Arrow record batch or one Parquet row group.
+    """
+
+    def __init__(self, path, fmt='parquet', batch_rows=10000, compression='zstd'):
+        """
+        Args:
+            path (str): Output file (overwritten)
+            fmt (str): 'arrow' or 'parquet'
+            batch_rows (int): Rows per record batch / row group
+            compression (str): Parquet compression codec
+        """
+        if fmt not in ('arrow', 'parquet'):
+            raise ValueError(f"Unknown Arrow format: {fmt}")
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(
+                f"The {fmt} output needs pyarrow: pip install pyarrow"
+            ) from None
+        super().__init__(path, batch_rows)
+        self._pa = pa
+        self.schema = pa.schema([
+            ('time', pa.float64()),
+            ('source', pa.string()),
+            ('frame', pa.int64()),
+            ('video_time', pa.float64()),
+            ('track_id', pa.int32()),
+            ('class_id', pa.uint8()),
+            ('class_name', pa.string()),
+            ('confidence', pa.float32()),
+            ('x1', pa.int32()),
+            ('y1', pa.int32()),
+            ('x2', pa.int32()),
+            ('y2', pa.int32()),
+        ])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(str(self.path), self.schema, compression=compression)
+        else:
+            self._writer = pa.ipc.new_file(str(self.path), self.schema)
+
+    def _write_rows(self, columns):
+        table = self._pa.Table.from_pydict(columns, schema=self.schema)
+        self._writer.write_table(table)
+
+    def _close(self):
+        self._writer.close()
+
+
+def open_sink(path, fmt=None, batch_rows=10000):
+    """
+    Open a detection sink, picking the format from the file suffix.
+    เปิดตัวเขียนผลการตรวจจับ โดยเลือกรูปแบบจากนามสกุลไฟล์
+
+    Args:
+        path (str): Output file
+        fmt (str): 'jsonl', 'arrow' or 'parquet' (default: from suffix)
+        batch_rows (int): Rows buffered before each write
+
+    Returns:
+        DetectionSink: The opened sink; call close() when done
+    """
+    if fmt is None:
+        fmt = _SUFFIX_FORMATS.get(Path(path).suffix.lower())
+        if fmt is None:
+            raise ValueError(
+                f"Cannot tell the output format of {path}; use a .jsonl, "
+                ".arrow or .parquet file or give the format"
+            )
+    if fmt == 'jsonl':
+        return JsonLinesSink(path, batch_rows)
+    if fmt in ('arrow', 'parquet'):
+        return ArrowSink(path, fmt, batch_rows)
+    raise ValueError(f"Unknown output format: {fmt} (choose from {', '.join(SINK_FORMATS)})")
@@ -0,0 +1,162 @@
+"""
+Tiled inference for high-resolution traffic images
+การตรวจจับแบบแบ่งภาพเป็นชิ้นสำหรับภาพจราจรความละเอียดสูง
+
+A 4K frame shrunk to the model's 640 px input makes distant cars only a
+few pixels wide. Tiled inference cuts the frame into overlapping tiles at
+(close to) the model's input size, runs all tiles through the model in
+batches, shifts the boxes back to frame coordinates and merges duplicates
+from the overlaps. A vehicle cut by a tile border shows up as a clipped
+box inside a neighbour's full box, which IoU alone does not catch, so
+boxes from different tiles are merged when the smaller one lies mostly
+inside the larger (intersection over the smaller area). An optional
+full-frame pass keeps large vehicles that do not fit in one tile.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import time
+
+import numpy as np
+
+from backends import BackendResult
+
+
+def _starts(length, tile_size, step):
+    """Tile start offsets along one axis, the last one flush with the edge."""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def tile_windows(width, height, tile_size=640, overlap=0.2):
+    """
+    Overlapping tile windows covering an image.
+    คำนวณตำแหน่งของชิ้นภาพที่ซ้อนทับกันให้ครอบคลุมทั้งภาพ
+
+    Args:
+        width (int): Image width
+        height (int): Image height
+        tile_size (int): Tile width and height in pixels
+        overlap (float): Fraction of a tile shared with its neighbour (0-0.9)
+
+    Returns:
+        np.ndarray: (N, 4) windows as x1, y1, x2, y2
+    """
+    if tile_size < 32:
+        raise ValueError("tile_size must be at least 32 pixels")
+    if not 0 <= overlap < 0.9:
+        raise ValueError("overlap must be between 0.0 and 0.9")
+    step = max(1, int(tile_size * (1 - overlap)))
+    return np.array([
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _starts(height, tile_size, step)
+        for x in _starts(width, tile_size, step)
+    ], dtype=np.int64)
+
+
+def merge_tile_boxes(boxes, scores, class_ids, tile_ids, threshold=0.5, max_det=300):
+    """
+    Greedily merge same-class boxes that come from different tiles.
+    รวมกรอบของคลาสเดียวกันที่มาจากชิ้นภาพต่างกัน
+
+    The highest-scoring box absorbs every box from another tile whose
+    intersection covers more than `threshold` of the smaller box; the
+    merged box is the union of the group and keeps the highest score.
+
+    Returns:
+        tuple: (boxes, scores, class_ids) of the merged detections
+    """
+    x1, y1, x2, y2 = boxes.T.astype(np.float32)
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind='stable')
+    out_boxes, keep = [], []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        rest = order[1:]
+        inter = (
+            np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None) *
+            np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        )
+        ios = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        group = rest[
+            (ios > threshold) & (class_ids[rest] == class_ids[i]) & (tile_ids[rest] != tile_ids[i])
+        ]
+        members = np.concatenate([[i], group])
+        out_boxes.append([x1[members].min(), y1[members].min(), x2[members].max(), y2[members].max()])
+        keep.append(i)
+        order = rest[~np.isin(rest, group)]
+    keep = np.array(keep, dtype=np.int64)
+    return np.array(out_boxes, dtype=np.float32).reshape(-1, 4), scores[keep], class_ids[keep]
+
+
+def predict_tiled(predict, frames, tile_size=640, overlap=0.2, batch_size=8,
+                  full_frame=True, merge_threshold=0.5, max_det=300):
+    """
+    Run a backend predict function over tiles of each frame.
+    ประมวลผลโมเดลบนชิ้นภาพของแต่ละเฟรมแล้วรวมผลลัพธ์
+
+    Tiles of all frames are pooled and sent to the model `batch_size` at
+    a time, so one call keeps every inference thread busy. Tiles are
+    views into the frames; nothing is copied until the backend resizes.
+
+    Args:
+        predict (callable): Takes a list of images and returns one
+            BackendResult per image
+        frames (list): BGR images
+        tile_size (int): Tile size in pixels (use the model input size)
+        overlap (float): Fraction of a tile shared with its neighbour
+        batch_size (int): Tiles per model call
+        full_frame (bool): Also run the whole frame once, for vehicles
+            larger than a tile
+        merge_threshold (float): Fraction of the smaller box that must
+            overlap for boxes from different tiles to be merged
+        max_det (int): Maximum detections kept per frame
+
+    Returns:
+        list: One BackendResult per frame, in frame coordinates
+    """
+    crops, owners, offsets = [], [], []
+    for index, frame in enumerate(frames):
+        height, width = frame.shape[:2]
+        windows = tile_windows(width, height, tile_size, overlap)
+        for x1, y1, x2, y2 in windows.tolist():
+            crops.append(frame[y1:y2, x1:x2])
+            owners.append(index)
+            offsets.append((x1, y1))
+        if full_frame and len(windows) > 1:
+            crops.append(frame)
+            owners.append(index)
+            offsets.append((0, 0))
+
+    # Batched inference over all tiles / ประมวลผลทุกชิ้นภาพเป็นแบตช์
+    tile_results = []
+    for i in range(0, len(crops), batch_size):
+        tile_results.extend(predict(crops[i:i + batch_size]))
+
+    parts = [[] for _ in frames]
+    speeds = [{} for _ in frames]
+    for tile_id, (owner, (x, y), result) in enumerate(zip(owners, offsets, tile_results)):
+        parts[owner].append((result, x, y, tile_id))
+        for stage, ms in result.speed.items():
+            speeds[owner][stage] = speeds[owner].get(stage, 0.0) + (ms or 0.0)
+
+    merged = []
+    for frame_parts, speed in zip(parts, speeds):
+        start = time.perf_counter()
+        boxes = np.concatenate([
+            r.boxes + np.array([x, y, x, y], dtype=r.boxes.dtype) for r, x, y, _ in frame_parts
+        ])
+        confidences = np.concatenate([r.confidences for r, _, _, _ in frame_parts])
+        class_ids = np.concatenate([r.class_ids for r, _, _, _ in frame_parts])
+        tile_ids = np.concatenate([np.full(len(r.boxes), t) for r, _, _, t in frame_parts])
+        # Merge duplicates from overlapping tiles / รวมกรอบซ้ำจากชิ้นภาพที่ซ้อนทับกัน
+        boxes, confidences, class_ids = merge_tile_boxes(
+            boxes, confidences, class_ids, tile_ids, merge_threshold, max_det
+        )
+        speed['postprocess'] = speed.get('postprocess', 0.0) + (time.perf_counter() - start) * 1000
+        merged.append(BackendResult(boxes, confidences, class_ids, speed))
+    return merged
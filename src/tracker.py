@@ -0,0 +1,209 @@
+"""
+Lightweight multi-object tracker for vehicles
+ตัวติดตามวัตถุหลายชิ้นแบบเบาสำหรับยานพาหนะ
+
+Tracks are matched to detections by IoU and smoothed with a constant
+velocity Kalman filter, all in NumPy. Between detector runs the filter
+predicts where each vehicle moved, so the detector can run on a subset of
+frames while boxes keep following the traffic.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import numpy as np
+
+from box_ops import box_iou
+from detections import Detections
+
+
+def _greedy_match(iou, threshold):
+    """Match rows to columns greedily by descending IoU."""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind='stable')
+    used_rows, used_cols, matches = set(), set(), []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r not in used_rows and c not in used_cols:
+            used_rows.add(r)
+            used_cols.add(c)
+            matches.append((r, c))
+    return matches
+
+
+# Constant velocity model on (cx, cy, w, h) and their per-frame velocities
+# แบบจำลองความเร็วคงที่ของ (cx, cy, w, h) และความเร็วต่อเฟรม
+_F = np.eye(8, dtype=np.float64)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8, dtype=np.float64)
+
+
+def _xyxy_to_cxcywh(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64)
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w, h], axis=1)
+
+
+def _cxcywh_to_xyxy(state):
+    cx, cy, w, h = state[:, 0], state[:, 1], np.maximum(state[:, 2], 1), np.maximum(state[:, 3], 1)
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+class VehicleTracker:
+    """
+    Assign stable ids to vehicles across video frames.
+    กำหนดหมายเลขประจำตัวยานพาหนะที่คงที่ข้ามเฟรมวิดีโอ
+
+    Call step() once per frame. Pass the detections when the detector ran
+    on that frame, or None to only advance the motion model.
+
+    Attributes:
+        class_names (dict): Mapping from class id to class name
+        unique_count (int): Number of distinct vehicles confirmed so far
+        unique_by_class (dict): Distinct vehicles per class name
+    """
+
+    def __init__(self, class_names=None, iou_threshold=0.3, max_age=3, min_hits=2):
+        """
+        Args:
+            class_names (dict): Mapping from class id to class name
+            iou_threshold (float): Minimum IoU to match a detection to a track
+            max_age (int): Detector runs a track may go unmatched before it
+                is dropped
+            min_hits (int): Matches needed before a track is reported and
+                counted
+        """
+        self.class_names = class_names if class_names is not None else {}
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+
+        self._next_id = 1
+        self._ids = np.empty(0, dtype=np.int32)
+        self._class_ids = np.empty(0, dtype=np.uint8)
+        self._confidences = np.empty(0, dtype=np.float32)
+        self._hits = np.empty(0, dtype=np.int32)
+        self._misses = np.empty(0, dtype=np.int32)
+        self._x = np.empty((0, 8), dtype=np.float64)
+        self._p = np.empty((0, 8, 8), dtype=np.float64)
+
+        self.unique_count = 0
+        self.unique_by_class = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _noise(self, heights, position_weight, velocity_weight):
+        """Per-track diagonal noise scaled with box height."""
+        h = np.maximum(heights, 1.0)[:, None]
+        std = np.concatenate([
+            np.repeat(position_weight * h, 4, axis=1),
+            np.repeat(velocity_weight * h, 4, axis=1)
+        ], axis=1)
+        return np.einsum('ni,ij->nij', std ** 2, np.eye(8))
+
+    def _predict(self):
+        """Advance every track by one frame."""
+        if not len(self):
+            return
+        self._x = self._x @ _F.T
+        q = self._noise(self._x[:, 3], 1 / 20, 1 / 160)
+        self._p = _F @ self._p @ _F.T + q
+
+    def _correct(self, track_index, measurements):
+        """Apply Kalman updates for matched tracks in one batch."""
+        x = self._x[track_index]
+        p = self._p[track_index]
+        r = self._noise(x[:, 3], 1 / 20, 0)[:, :4, :4]
+        s = _H @ p @ _H.T + r
+        k = p @ _H.T @ np.linalg.inv(s)
+        innovation = measurements - x @ _H.T
+        self._x[track_index] = x + np.einsum('nij,nj->ni', k, innovation)
+        self._p[track_index] = (np.eye(8) - k @ _H) @ p
+
+    def _spawn(self, detections):
+        """Start new tracks from unmatched detections."""
+        n = len(detections)
+        if not n:
+            return
+        x = np.zeros((n, 8), dtype=np.float64)
+        x[:, :4] = _xyxy_to_cxcywh(detections.boxes)
+        p = self._noise(x[:, 3], 2 / 20, 10 / 160)
+
+        self._ids = np.concatenate([self._ids, np.arange(self._next_id, self._next_id + n, dtype=np.int32)])
+        self._next_id += n
+        self._class_ids = np.concatenate([self._class_ids, detections.class_ids])
+        self._confidences = np.concatenate([self._confidences, detections.confidences])
+        self._hits = np.concatenate([self._hits, np.ones(n, dtype=np.int32)])
+        self._misses = np.concatenate([self._misses, np.zeros(n, dtype=np.int32)])
+        self._x = np.concatenate([self._x, x])
+        self._p = np.concatenate([self._p, p])
+        self._count_new(np.arange(len(self) - n, len(self)))
+
+    def _count_new(self, index):
+        """Add tracks that just reached min_hits to the unique counts."""
+        newly_confirmed = index[self._hits[index] == self.min_hits]
+        for class_id in self._class_ids[newly_confirmed].tolist():
+            name = self.class_names.get(class_id, str(class_id))
+            self.unique_by_class[name] = self.unique_by_class.get(name, 0) + 1
+        self.unique_count += len(newly_confirmed)
+
+    def _keep(self, mask):
+        self._ids = self._ids[mask]
+        self._class_ids = self._class_ids[mask]
+        self._confidences = self._confidences[mask]
+        self._hits = self._hits[mask]
+        self._misses = self._misses[mask]
+        self._x = self._x[mask]
+        self._p = self._p[mask]
+
+    def _update(self, detections):
+        """Match detections to predicted tracks and update their state."""
+        track_boxes = _cxcywh_to_xyxy(self._x)
+        iou = box_iou(track_boxes, detections.boxes) if len(self) and len(detections) else \
+            np.zeros((len(self), len(detections)))
+        # Only match boxes of the same class / จับคู่เฉพาะกรอบที่เป็นคลาสเดียวกัน
+        iou[self._class_ids[:, None] != detections.class_ids[None, :]] = 0
+        matches = _greedy_match(iou, self.iou_threshold)
+
+        matched_tracks = np.array([t for t, _ in matches], dtype=np.int64)
+        matched_dets = np.array([d for _, d in matches], dtype=np.int64)
+        self._misses += 1
+        if len(matches):
+            self._correct(matched_tracks, _xyxy_to_cxcywh(detections.boxes[matched_dets]))
+            self._confidences[matched_tracks] = detections.confidences[matched_dets]
+            self._hits[matched_tracks] += 1
+            self._misses[matched_tracks] = 0
+            self._count_new(matched_tracks)
+
+        self._keep(self._misses <= self.max_age)
+
+        unmatched = np.ones(len(detections), dtype=bool)
+        unmatched[matched_dets] = False
+        self._spawn(detections[unmatched])
+
+    def step(self, detections=None):
+        """
+        Advance the tracker by one frame.
+        เลื่อนตัวติดตามไปหนึ่งเฟรม
+
+        Args:
+            detections (Detections): Detector output for this frame, or None
+                if the detector did not run
+
+        Returns:
+            Detections: Boxes of confirmed tracks that are currently
+                visible, with track_ids set
+        """
+        self._predict()
+        if detections is not None:
+            self._update(detections)
+
+        visible = (self._hits >= self.min_hits) & (self._misses == 0)
+        return Detections(
+            np.round(_cxcywh_to_xyxy(self._x[visible])),
+            self._confidences[visible],
+            self._class_ids[visible],
+            self.class_names,
+            self._ids[visible]
+        )
@@ -0,0 +1,313 @@
+"""
+Chunked, resumable processing of long videos
+การประมวลผลวิดีโอยาวแบบแบ่งช่วงและทำต่อได้
+
+A long recording is split into frame ranges. Each range is handled by a
+worker process that seeks to its first frame (CAP_PROP_POS_FRAMES),
+checks where the seek landed (falling back to reading forward from the
+start of the file when it is off), detects vehicles and writes its own annotated clip and detection rows
+into a work folder. Finished chunks are recorded in progress.json, so an
+interrupted run picks up where it stopped; when every chunk is done, the
+clips and rows are stitched back together in frame order.
+
+Work folder layout:
+  progress.json       Video, settings and finished chunk numbers
+  chunk_00000.mp4     Annotated frames of chunk 0 (when saving video)
+  chunk_00000.jsonl   Detection rows of chunk 0 (see sinks.py)
+
+Each chunk starts without history, so tracking and frame skipping are not
+available in this mode. Frame numbers follow the container's frame index;
+for variable frame rate files or streams with broken timestamps OpenCV's
+reported position can itself be off, so chunk boundaries may shift by a
+few frames there.
+
+Author: Object Detection Tutorial
+License: MIT
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import cv2
+
+from sinks import JsonLinesSink
+
+
+# Detector owned by the current worker process / ตัวตรวจจับของโปรเซสนี้
+_worker_detector = None
+
+
+def _init_worker(model_name, conf_threshold, threads, detector_options):
+    """Load the model once per worker process."""
+    global _worker_detector
+    from car_detector import CarDetector
+    _worker_detector = CarDetector(
+        model_name=model_name, conf_threshold=conf_threshold, threads=threads,
+        **detector_options
+    )
+
+
+def plan_chunks(frame_count, chunk_frames):
+    """
+    Split a video into consecutive frame ranges.
+    แบ่งวิดีโอเป็นช่วงเฟรมต่อเนื่องกัน
+
+    Returns:
+        list: (start, end) frame ranges; the last end is None so the last
+            chunk reads to the real end of the file
+    """
+    if chunk_frames < 1:
+        raise ValueError("chunk_frames must be at least 1")
+    starts = list(range(0, max(frame_count, 1), chunk_frames))
+    return [(start, start + chunk_frames) for start in starts[:-1]] + [(starts[-1], None)]
+
+
+def _chunk_paths(work_dir, index):
+    return work_dir / f"chunk_{index:05d}.mp4", work_dir / f"chunk_{index:05d}.jsonl"
+
+
+def _seek(cap, start, reopen):
+    """
+    Move a capture to frame `start` and return it, checking where it landed.
+    เลื่อนไปยังเฟรมแรกของช่วงและตรวจสอบตำแหน่งที่ได้จริง
+
+    OpenCV decodes forward from the previous keyframe, but some containers
+    and codecs land on another frame. Then the video is read forward from
+    the beginning instead, which is slower but exact.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    landed = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if landed == start:
+        return cap
+    print(f"Seek to frame {start} landed on {landed}; reading forward instead")
+    if 0 <= landed < start:
+        skip = start - landed
+    else:
+        cap.release()
+        cap = reopen()
+        skip = start
+    for _ in range(skip):
+        if not cap.grab():
+            break
+    return cap
+
+
+def _process_chunk(video_path, index, start, end, work_dir, annotate, roi, batch_size):
+    """Detect one frame range inside a worker and write its clip and rows."""
+    begin = time.perf_counter()
+    detector = _worker_detector
+    video_out, rows_out = _chunk_paths(Path(work_dir), index)
+    video_tmp = video_out.with_suffix('.part.mp4')
+    rows_tmp = rows_out.with_suffix('.part.jsonl')
+
+    cap = detector._open_video(video_path)
+    if start:
+        cap = _seek(cap, start, lambda: detector._open_video(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    writer = None
+    if annotate:
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        writer = cv2.VideoWriter(str(video_tmp), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    sink = JsonLinesSink(rows_tmp)
+
+    frame_index = start
+    try:
+        while True:
+            frames = []
+            while len(frames) < batch_size and (end is None or frame_index + len(frames) < end):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+            results = detector.detect_frames(frames, rois=[roi] * len(frames))
+            for frame, detections in zip(frames, results):
+                frame_index += 1
+                sink.write(
+                    detections, frame=frame_index, source=video_path,
+                    video_time=(frame_index - 1) / fps if fps else None
+                )
+                if writer is not None:
+                    if roi is not None:
+                        roi.draw(frame)
+                    info_text = f"Frame: {frame_index} | Vehicles: {len(detections)}"
+                    detector._draw_video_detections(frame, detections, info_text)
+                    writer.write(frame)
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+        sink.close()
+
+    # Publish the clip first, the rows last: the rows file marks the chunk done
+    # บันทึกคลิปก่อน แล้วจึงบันทึกแถวผลลัพธ์ซึ่งเป็นตัวบอกว่าช่วงนี้เสร็จแล้ว
+    if writer is not None:
+        os.replace(video_tmp, video_out)
+    os.replace(rows_tmp, rows_out)
+    return os.getpid(), index, frame_index - start, time.perf_counter() - begin
+
+
+class _Progress:
+    """Checkpoint of finished chunks, rewritten atomically after each one."""
+
+    def __init__(self, work_dir, settings):
+        self.path = Path(work_dir) / 'progress.json'
+        self.settings = settings
+        self.done = set()
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            if saved.get('settings') != settings:
+                raise ValueError(
+                    f"{self.path.parent} holds chunks of another video or settings; "
+                    "delete it or choose another work folder"
+                )
+            self.done = set(saved.get('done', []))
+
+    def mark_done(self, index):
+        self.done.add(index)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'settings': self.settings, 'done': sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def _stitch(work_dir, chunk_count, annotate, output_path, sink):
+    """Join chunk clips into one video and chunk rows into the sink, in order."""
+    writer = None
+    try:
+        for index in range(chunk_count):
+            video_in, rows_in = _chunk_paths(work_dir, index)
+            if sink is not None:
+                with open(rows_in, 'r') as f:
+                    sink.write_records(json.loads(line) for line in f if line.strip())
+            if not (annotate and output_path):
+                continue
+            cap = cv2.VideoCapture(str(video_in))
+            if writer is None:
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            cap.release()
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+def detect_video_chunked(video_path, output_path=None, workers=2, chunk_frames=None,
+                         work_dir=None, model_name='yolov8n.pt', conf_threshold=0.5,
+                         sink=None, roi=None, batch_size=8, keep_chunks=False,
+                         stats=None, **detector_options):
+    """
+    Detect cars in a long video as parallel, checkpointed frame ranges.
+    ตรวจจับรถยนต์ในวิดีโอยาวโดยแบ่งเป็นช่วงและประมวลผลแบบขนาน
+
+    Args:
+        video_path (str): Video file (cameras cannot be split)
+        output_path (str): Annotated output video (optional)
+        workers (int): Worker processes, each with its own model
+        chunk_frames (int): Frames per chunk (default: the video split
+            into 4 chunks per worker)
+        work_dir (str): Folder for chunk files and the checkpoint
+            (default: <output or video>.chunks next to it)
+        model_name (str): YOLOv8 model loaded by each worker
+        conf_threshold (float): Confidence threshold for detections
+        sink (DetectionSink): Receives every detection row, in frame
+            order, once all chunks are done (optional)
+        roi (RegionOfInterest): Only detect inside this region (optional)
+        batch_size (int): Frames per inference call inside a worker
+        keep_chunks (bool): Keep the work folder after stitching
+        stats (WorkerStats): Collects per-worker throughput (optional)
+        **detector_options: Other CarDetector arguments, e.g. backend,
+            imgsz or max_det
+
+    Returns:
+        int: Number of frames processed
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    video_path = str(video_path)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video from {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if frame_count <= 0:
+        raise ValueError(f"Cannot tell the length of {video_path}; chunking needs a video file")
+    chunk_frames = chunk_frames or max(1, -(-frame_count // (4 * workers)))
+    chunks = plan_chunks(frame_count, chunk_frames)
+
+    annotate = bool(output_path)
+    work_dir = Path(work_dir or f"{output_path or video_path}.chunks")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    stat = os.stat(video_path)
+    progress = _Progress(work_dir, {
+        'video': os.path.abspath(video_path), 'size': stat.st_size,
+        'mtime': int(stat.st_mtime), 'chunk_frames': chunk_frames,
+        'annotate': annotate, 'model': str(model_name), 'conf': conf_threshold,
+        'roi': None if roi is None else roi.fingerprint,
+        'options': {
+            k: v for k, v in sorted(detector_options.items())
+            if isinstance(v, (bool, int, float, str, type(None)))
+        },
+    })
+    pending = [
+        i for i in range(len(chunks))
+        if i not in progress.done or not _chunk_paths(work_dir, i)[1].exists()
+    ]
+    if len(pending) < len(chunks):
+        print(f"Resuming: {len(chunks) - len(pending)} of {len(chunks)} chunk(s) already done")
+
+    backend = detector_options.get('backend', 'auto')
+    if pending and backend not in ('auto', 'torch') and Path(model_name).suffix == '.pt':
+        # Export once here rather than racing in every worker
+        # ส่งออกโมเดลครั้งเดียวก่อนเริ่มโปรเซสลูก
+        from backends import export_model
+        model_name = str(export_model(model_name, backend, detector_options.get('imgsz', 640)))
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    frames_done = 0
+    if pending:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, conf_threshold, threads, detector_options)
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _process_chunk, video_path, i, chunks[i][0], chunks[i][1],
+                    str(work_dir), annotate, roi, batch_size
+                )
+                for i in pending
+            }
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pid, index, frames, seconds = future.result()
+                    progress.mark_done(index)
+                    frames_done += frames
+                    if stats is not None:
+                        stats.add(pid, frames, seconds)
+                    print(f"Chunk {index + 1}/{len(chunks)}: {frames} frames in {seconds:.1f}s")
+
+    # Stitch in frame order / รวมผลลัพธ์ตามลำดับเฟรม
+    _stitch(work_dir, len(chunks), annotate, output_path, sink)
+    if not keep_chunks:
+        shutil.rmtree(work_dir)
+    print(f"Processed {frames_done} frames in {len(pending)} chunk(s)")
+    if output_path:
+        print(f"Saved output to: {output_path}")
+    return frames_done
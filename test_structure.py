@@ -5,9 +5,16 @@ Test script to validate the project structure
 """
 
 import os
+import subprocess
 import sys
+import time
 from pathlib import Path
 
+# `car_detector.py --help` must answer within this many seconds and
+# without importing these modules / เวลาเริ่มต้นสูงสุดของ CLI
+STARTUP_BUDGET_S = 0.5
+HEAVY_MODULES = ('cv2', 'numpy', 'torch', 'ultralytics')
+
 def check_file_exists(path, description):
     """Check if a file exists"""
     if os.path.exists(path):
@@ -26,6 +33,33 @@ def check_directory_exists(path, description):
         print(f"✗ {description}: {path}/ NOT FOUND")
         return False
 
+def check_cli_startup():
+    """Check that --help is fast and does not load heavy dependencies"""
+    command = [sys.executable, '-X', 'importtime', 'src/car_detector.py', '--help']
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            print(f"✗ car_detector.py --help failed: {result.stderr.strip().splitlines()[-1:]}")
+            return False
+    
+    # -X importtime writes one "import time: self | cumulative | name" line per module
+    imported = {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines()}
+    heavy = [name for name in HEAVY_MODULES if name in imported]
+    if heavy:
+        print(f"✗ car_detector.py --help imports {', '.join(heavy)}")
+        return False
+    
+    best = min(timings)
+    if best > STARTUP_BUDGET_S:
+        print(f"✗ car_detector.py --help took {best:.2f}s (budget {STARTUP_BUDGET_S}s)")
+        return False
+    print(f"✓ car_detector.py --help in {best:.2f}s (budget {STARTUP_BUDGET_S}s), "
+          f"no {'/'.join(HEAVY_MODULES)} imports")
+    return True
+
 def main():
     print("=" * 70)
     print("Car Object Detection Tutorial - Structure Validation")
@@ -67,7 +101,7 @@ def main():
     print("Python Syntax Check / ตรวจสอบไวยากรณ์ Python:")
     import ast
     
-    py_files = ["src/car_detector.py", "demo.py"]
+    py_files = ["src/car_detector.py", "src/cli.py", "demo.py"]
     for file in py_files:
         try:
             with open(file, 'r') as f:
@@ -78,6 +112,11 @@ def main():
             all_checks_passed = False
     print()
     
+    # Check CLI startup time
+    print("CLI Startup Check / ตรวจสอบเวลาเริ่มต้นของ CLI:")
+    all_checks_passed &= check_cli_startup()
+    print()
+    
     # Check requirements.txt content
     print("Dependencies Check / ตรวจสอบการขึ้นต่อกัน:")
     required_packages = ['opencv-python', 'numpy', 'torch', 'ultralytics']